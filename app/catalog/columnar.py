@@ -0,0 +1,175 @@
+import threading
+import numpy as np
+
+# Column-per-field copy of the catalog for filter + facet queries. Numeric
+# fields are float arrays, string fields are dictionary-encoded int32 codes
+# (-1 = missing), so a filter is a handful of vectorized comparisons and each
+# facet is one bincount/searchsorted over the matching rows. Deleted products
+# leave a dead row that the next upsert reuses.
+
+NUMERIC = {"price": "price", "rating": "rating", "stock": "stock_quantity", "total_sold": "total_sold"}
+CODED = ("category", "subcategory", "seller_id", "origin")
+FLAGS = ("is_active", "is_organic")
+# lower edges of the price facet buckets; the last bucket is open-ended
+PRICE_BUCKETS = (0, 100, 250, 500, 1000, 2500)
+
+class _Dictionary:
+    def __init__(self):
+        self.codes: dict[str, int] = {}
+        self.values: list[str] = []
+
+    def encode(self, value) -> int:
+        if value is None or value == "":
+            return -1
+        value = str(value)
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value) -> int | None:
+        return self.codes.get(str(value))
+
+class ColumnarIndex:
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.RLock()
+        self._rows: dict[str, int] = {}
+        self._free: list[int] = []
+        self._size = 0
+        self._ids = np.empty(capacity, dtype=object)
+        self._alive = np.zeros(capacity, dtype=bool)
+        self._num = {k: np.zeros(capacity, dtype=np.float64) for k in NUMERIC}
+        self._flags = {k: np.zeros(capacity, dtype=bool) for k in FLAGS}
+        self._codes = {k: np.full(capacity, -1, dtype=np.int32) for k in CODED}
+        self._dicts = {k: _Dictionary() for k in CODED}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _grow(self):
+        n = len(self._alive) * 2
+        self._ids = np.resize(self._ids, n)
+        self._alive = np.concatenate([self._alive, np.zeros(n - len(self._alive), dtype=bool)])
+        for cols, fill in ((self._num, 0.0), (self._flags, False), (self._codes, -1)):
+            for k, arr in cols.items():
+                cols[k] = np.concatenate([arr, np.full(n - len(arr), fill, dtype=arr.dtype)])
+
+    def upsert(self, doc: dict):
+        pid = doc.get("id")
+        if not pid:
+            return
+        with self._lock:
+            row = self._rows.get(pid)
+            if row is None:
+                if self._free:
+                    row = self._free.pop()
+                else:
+                    if self._size == len(self._alive):
+                        self._grow()
+                    row = self._size
+                    self._size += 1
+                self._rows[pid] = row
+            self._ids[row] = pid
+            self._alive[row] = True
+            for k, field in NUMERIC.items():
+                self._num[k][row] = float(doc.get(field) or 0)
+            for k in FLAGS:
+                self._flags[k][row] = doc.get(k) is True
+            for k in CODED:
+                self._codes[k][row] = self._dicts[k].encode(doc.get(k))
+
+    def remove(self, pid: str):
+        with self._lock:
+            row = self._rows.pop(pid, None)
+            if row is not None:
+                self._alive[row] = False
+                self._ids[row] = None
+                self._free.append(row)
+
+    def rebuild(self, docs):
+        fresh = ColumnarIndex(capacity=max(1024, len(docs)))
+        for d in docs:
+            fresh.upsert(d)
+        with self._lock:
+            self._rows = fresh._rows
+            self._free = fresh._free
+            self._size = fresh._size
+            self._ids = fresh._ids
+            self._alive = fresh._alive
+            self._num = fresh._num
+            self._flags = fresh._flags
+            self._codes = fresh._codes
+            self._dicts = fresh._dicts
+
+    def _masks(self, filters: dict) -> dict[str, np.ndarray]:
+        """One boolean mask per active filter, over the first _size rows."""
+        n = self._size
+        masks = {}
+        for k in CODED:
+            if filters.get(k) is not None:
+                code = self._dicts[k].lookup(filters[k])
+                masks[k] = self._codes[k][:n] == code if code is not None else np.zeros(n, dtype=bool)
+        for k in FLAGS:
+            if filters.get(k) is not None:
+                masks[k] = self._flags[k][:n] == bool(filters[k])
+        price = self._num["price"][:n]
+        if filters.get("min_price") is not None or filters.get("max_price") is not None:
+            m = np.ones(n, dtype=bool)
+            if filters.get("min_price") is not None:
+                m &= price >= filters["min_price"]
+            if filters.get("max_price") is not None:
+                m &= price <= filters["max_price"]
+            masks["price"] = m
+        return masks
+
+    @staticmethod
+    def _combine(base: np.ndarray, masks: dict, skip: str | None = None) -> np.ndarray:
+        out = base.copy()
+        for k, m in masks.items():
+            if k != skip:
+                out &= m
+        return out
+
+    def query(self, filters: dict, facets: bool = False, ids: bool = True, within=None) -> dict:
+        """
+        filters: category, subcategory, seller_id, origin, is_active, is_organic,
+        min_price, max_price (None = not filtered). Returns the total and (with
+        ids=True) the matching product ids; with facets=True also per-category and per-price-bucket
+        counts, each computed with every filter except its own so the sidebar
+        can show the alternatives. within: only count these product ids (e.g.
+        search hits), for every facet.
+        """
+        with self._lock:
+            n = self._size
+            alive = self._alive[:n]
+            if within is not None:
+                alive = alive.copy()
+                rows = [self._rows[pid] for pid in within if pid in self._rows]
+                keep = np.zeros(n, dtype=bool)
+                keep[rows] = True
+                alive &= keep
+            masks = self._masks(filters)
+            match = self._combine(alive, masks)
+            out = {"total": int(match.sum())}
+            if ids:
+                out["ids"] = self._ids[:n][match].tolist()
+            if facets:
+                cat_rows = self._codes["category"][:n][self._combine(alive, masks, skip="category")]
+                cat_rows = cat_rows[cat_rows >= 0]
+                counts = np.bincount(cat_rows, minlength=len(self._dicts["category"].values))
+                names = self._dicts["category"].values
+                prices = self._num["price"][:n][self._combine(alive, masks, skip="price")]
+                bucket = np.clip(np.searchsorted(PRICE_BUCKETS, prices, side="right") - 1, 0, None)
+                buckets = np.bincount(bucket, minlength=len(PRICE_BUCKETS))
+                out["facets"] = {
+                    "category": {names[i]: int(c) for i, c in enumerate(counts) if c},
+                    "price": [
+                        {"min": lo, "max": PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None,
+                         "count": int(buckets[i])}
+                        for i, lo in enumerate(PRICE_BUCKETS)
+                    ],
+                }
+            return out
+
+columnar_index = ColumnarIndex()
@@ -0,0 +1,25 @@
+from app.core.cache import AsyncLoadingCache
+from app.core.config import settings
+from app.core.firebase import adb
+
+# Per-worker cache of full product documents for the detail endpoint, bounded by
+# entry count and by PRODUCT_CACHE_MAX_MB of (approximate) memory. This worker's
+# writes invalidate through catalog.sync; other workers' writes are picked up
+# once the entry's PRODUCT_CACHE_TTL runs out.
+
+async def _load(pid: str) -> dict | None:
+    snap = await adb().collection("products").document(pid).get()
+    return snap.to_dict() if snap.exists else None
+
+async def _load_many(ids: list[str]) -> dict[str, dict | None]:
+    refs = [adb().collection("products").document(pid) for pid in ids]
+    return {s.id: s.to_dict() if s.exists else None async for s in adb().get_all(refs)}
+
+product_cache = AsyncLoadingCache(
+    _load,
+    maxsize=settings.PRODUCT_CACHE_SIZE,
+    ttl=settings.PRODUCT_CACHE_TTL,
+    negative_ttl=settings.NOT_FOUND_CACHE_TTL,
+    maxbytes=settings.PRODUCT_CACHE_MAX_MB * 1024 * 1024,
+    load_many=_load_many,
+)
@@ -0,0 +1,65 @@
+import sys
+
+# Compact per-product record for structures that hold the whole catalog (the
+# replica). Only list-view fields are kept, in __slots__; strings that repeat
+# across products are interned and lists become tuples. The large text fields
+# below are not held at all: the detail endpoint reads them through the
+# memory-bounded product cache.
+
+LARGE_FIELDS = frozenset({
+    "description", "nutritional_info", "storage_instructions", "shelf_life",
+    "seo_title", "seo_description", "seo_keywords", "rating_histogram",
+})
+_INTERNED = frozenset({"seller_id", "category", "subcategory", "unit", "origin"})
+
+def _freeze(value):
+    return tuple(_freeze(v) for v in value) if isinstance(value, list) else value
+
+def _thaw(value):
+    return [_thaw(v) for v in value] if isinstance(value, tuple) else value
+
+class ProductRecord:
+    __slots__ = (
+        "id", "seller_id", "name", "slug", "short_description", "category", "subcategory",
+        "price", "original_price", "discount_percentage", "unit", "stock_quantity",
+        "min_order_quantity", "max_order_quantity", "sku", "images", "origin", "is_organic",
+        "is_featured", "is_active", "total_sold", "rating", "review_count", "tags",
+        "created_at", "updated_at", "extra",
+    )
+    FIELDS = __slots__[:-1]
+
+    def __init__(self, doc: dict):
+        # a field the document doesn't have leaves its slot unset, so to_dict()
+        # has the same keys as the document (and as a Firestore select())
+        for f in self.FIELDS:
+            if f not in doc:
+                continue
+            v = doc[f]
+            if f in _INTERNED and isinstance(v, str):
+                v = sys.intern(v)
+            elif f == "tags" and isinstance(v, list):
+                v = tuple(sys.intern(t) if isinstance(t, str) else t for t in v)
+            setattr(self, f, _freeze(v))
+        # small fields outside the schema (e.g. rating_shards); large ones are dropped
+        extra = tuple((k, _freeze(v)) for k, v in doc.items() if k not in LARGE_FIELDS and k not in _SLOT_SET)
+        self.extra = extra or None
+
+    def get(self, field: str, default=None):
+        if field in _SLOT_SET:
+            v = getattr(self, field, None)
+            return default if v is None else _thaw(v)
+        for k, v in self.extra or ():
+            if k == field:
+                return _thaw(v)
+        return default
+
+    def to_dict(self) -> dict:
+        """List-view document: every stored field, without LARGE_FIELDS."""
+        out = {f: _thaw(getattr(self, f)) for f in self.FIELDS if hasattr(self, f)}
+        for k, v in self.extra or ():
+            out[k] = _thaw(v)
+        return out
+
+_SLOT_SET = frozenset(ProductRecord.FIELDS)
+# default projection of product listings
+SUMMARY_FIELDS = ProductRecord.FIELDS
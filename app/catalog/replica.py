@@ -0,0 +1,168 @@
+import asyncio
+import heapq
+import logging
+import threading
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+from app.core.firebase import adb, db
+from app.catalog import sync as catalog_sync
+from app.catalog.records import LARGE_FIELDS, ProductRecord
+from app.utils.firestore_helpers import encode_cursor, decode_cursor, project
+
+# Optional (CATALOG_REPLICA) per-worker copy of the whole products collection,
+# kept current by an on_snapshot listener. While it is live, product reads and
+# listings are answered from memory with any filter/sort combination; when the
+# listener is down callers fall back to Firestore. Products are held as compact
+# ProductRecords without LARGE_FIELDS; a projection that asks for those (or the
+# whole document) is ordered here and read from Firestore with get_all.
+#
+# Listener callbacks run on the Firestore client's thread, hence the lock.
+# supervise() resubscribes a listener that died, and reloads the catalog
+# indexes while it can't.
+
+log = logging.getLogger(__name__)
+
+_NUMERIC = {"price", "rating", "total_sold", "review_count", "stock_quantity"}
+
+def _sort_value(doc: dict, field: str):
+    v = doc.get(field)
+    if field in _NUMERIC:
+        return float(v or 0)
+    return "" if v is None else str(v)
+
+def cursor_after(cursor: str, field: str) -> tuple:
+    """(sort value, id) of the last row of a listing cursor sorted by `field`."""
+    values = decode_cursor(cursor)
+    if set(values) != {field, "__name__"}:
+        raise HTTPException(400, detail="Cursor does not match this listing")
+    value, name = values[field], values["__name__"]
+    if field in _NUMERIC:
+        valid = isinstance(value, (int, float)) and not isinstance(value, bool)
+    else:
+        valid = value is None or isinstance(value, str)
+    if not valid or not isinstance(name, str):
+        raise HTTPException(400, detail="Invalid cursor")
+    return _sort_value(values, field), name
+
+def serves(fields: list[str] | None) -> bool:
+    """True when the replica holds every field of the projection (None = whole document)."""
+    return fields is not None and LARGE_FIELDS.isdisjoint(fields)
+
+async def fetch(ids: list[str], fields: list[str] | None = None) -> list[dict]:
+    """Products from Firestore in `ids` order (one get_all), missing ones skipped."""
+    refs = [adb().collection("products").document(pid) for pid in ids]
+    docs = {s.id: s.to_dict() async for s in adb().get_all(refs, field_paths=fields) if s.exists} if refs else {}
+    return [docs[pid] for pid in ids if pid in docs]
+
+class CatalogReplica:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._docs: dict[str, ProductRecord] = {}
+        self._watch = None
+        self._loaded = threading.Event()
+
+    @property
+    def ready(self) -> bool:
+        return self._loaded.is_set() and self._watch is not None and self._watch.is_active
+
+    def __len__(self):
+        return len(self._docs)
+
+    def start(self, timeout: float = 60) -> bool:
+        """Subscribe and block until the initial snapshot arrived (call from a thread)."""
+        self._watch = db().collection("products").on_snapshot(self._on_snapshot)
+        if not self._loaded.wait(timeout):
+            log.warning("catalog replica: no initial snapshot after %ss, serving from Firestore", timeout)
+        return self.ready
+
+    def stop(self):
+        if self._watch is not None:
+            self._watch.unsubscribe()
+            self._watch = None
+
+    def restart(self, timeout: float = 60) -> bool:
+        self.stop()
+        self._loaded.clear()
+        return self.start(timeout)
+
+    async def supervise(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            if self.ready:
+                continue
+            log.warning("catalog replica: listener not live, resubscribing")
+            try:
+                if await run_in_threadpool(self.restart):
+                    continue
+            except Exception:
+                log.exception("catalog replica: resubscribe failed")
+            try:
+                await catalog_sync.load_catalog()
+            except Exception:
+                log.exception("catalog refresh failed; keeping previous indexes")
+
+    def _on_snapshot(self, snapshot, changes, read_time):
+        if not self._loaded.is_set():
+            # initial snapshot: bulk load, then build the indexes once
+            docs = [s.to_dict() or {} for s in snapshot]
+            records = {s.id: ProductRecord(d) for s, d in zip(snapshot, docs)}
+            with self._lock:
+                self._docs = records
+            catalog_sync.rebuild(docs)
+            self._loaded.set()
+            log.info("catalog replica: %d products loaded", len(docs))
+            return
+        for change in changes:
+            pid = change.document.id
+            if change.type.name == "REMOVED":
+                with self._lock:
+                    self._docs.pop(pid, None)
+                catalog_sync.product_deleted(pid)
+            else:
+                doc = change.document.to_dict() or {}
+                with self._lock:
+                    self._docs[pid] = ProductRecord(doc)
+                catalog_sync.product_saved(doc)
+
+    def __contains__(self, pid: str) -> bool:
+        return pid in self._docs
+
+    def get(self, pid: str) -> dict | None:
+        rec = self._docs.get(pid)
+        return rec.to_dict() if rec is not None else None
+
+    def get_many(self, ids: list[str], fields: list[str] | None = None) -> list[dict]:
+        docs = self._docs
+        return [project(docs[pid].to_dict(), fields) for pid in ids if pid in docs]
+
+    def paginate(self, predicate, field: str, descending: bool, limit: int, cursor: str | None = None,
+                 fields: list[str] | None = None) -> dict:
+        """
+        Same contract as firestore_helpers.paginate() for order_by(field) +
+        __name__: {"items", "next_cursor"}, with interchangeable cursors.
+        """
+        after = cursor_after(cursor, field) if cursor else None
+
+        with self._lock:
+            rows = [((_sort_value(d, field), pid), d) for pid, d in self._docs.items() if predicate(d)]
+        if after is not None:
+            rows = [r for r in rows if (r[0] < after if descending else r[0] > after)]
+        pick = heapq.nlargest if descending else heapq.nsmallest
+        top = pick(limit + 1, rows, key=lambda r: r[0])
+        page = top[:limit]
+        next_cursor = None
+        if len(top) > limit:
+            (value, pid), _ = page[-1]
+            next_cursor = encode_cursor({field: value, "__name__": pid})
+        return {"items": [project(d.to_dict(), fields) for _, d in page], "next_cursor": next_cursor}
+
+    async def paginate_full(self, predicate, field: str, descending: bool, limit: int, cursor: str | None = None,
+                            fields: list[str] | None = None) -> dict:
+        """paginate() for any projection: large fields are read from Firestore."""
+        if serves(fields):
+            return self.paginate(predicate, field, descending, limit, cursor, fields)
+        page = self.paginate(predicate, field, descending, limit, cursor, ["id"])
+        page["items"] = await fetch([d["id"] for d in page["items"]], fields)
+        return page
+
+replica = CatalogReplica()
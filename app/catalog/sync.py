@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from app.core.config import settings
+from app.core.firebase import adb
+from app.search.index import product_index
+from app.search.suggest import suggest_index
+from app.search.trigram import trigram_index
+from app.catalog.topk import topk_index
+from app.catalog.columnar import columnar_index
+from app.catalog.product_cache import product_cache
+from app.services.slugs import product_slugs
+from app.utils.response_cache import invalidate as invalidate_responses
+
+# In-memory product structures are per worker: they are loaded at startup, kept
+# current by this worker's product writes and reloaded periodically to pick up
+# writes made by other workers. Product writes also mark this worker's cached
+# product listings stale.
+
+log = logging.getLogger(__name__)
+
+def product_saved(doc: dict):
+    product_index.upsert(doc)
+    suggest_index.upsert(doc)
+    trigram_index.upsert(doc)
+    topk_index.upsert(doc)
+    columnar_index.upsert(doc)
+    product_slugs.put(doc.get("id"), doc.get("slug"))
+    product_cache.invalidate(doc.get("id"))
+    invalidate_responses("products", "seller_products")
+
+def product_deleted(pid: str):
+    product_index.remove(pid)
+    suggest_index.remove(pid)
+    trigram_index.remove(pid)
+    topk_index.remove(pid)
+    columnar_index.remove(pid)
+    product_slugs.remove(pid)
+    product_cache.invalidate(pid)
+    invalidate_responses("products", "seller_products")
+
+def rebuild(docs: list[dict]):
+    product_index.rebuild(docs)
+    suggest_index.rebuild(docs)
+    trigram_index.rebuild(docs)
+    topk_index.rebuild(docs)
+    columnar_index.rebuild(docs)
+    product_slugs.rebuild(docs)
+
+async def load_catalog():
+    docs = [d.to_dict() for d in await adb().collection("products").get()]
+    rebuild(docs)
+    return len(docs)
+
+async def refresh_loop():
+    while True:
+        await asyncio.sleep(settings.CATALOG_REFRESH_SECONDS)
+        try:
+            await load_catalog()
+        except Exception:
+            log.exception("catalog refresh failed; keeping previous indexes")
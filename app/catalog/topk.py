@@ -0,0 +1,85 @@
+import heapq
+import threading
+from app.search.index import filter_meta
+
+# Sorted product listings Firestore can't serve (no composite index for the
+# filter + sort combination). Holds only the filter and sort fields of each
+# product; a page is the k smallest sort keys after the cursor, found with a
+# heap instead of sorting the whole catalog.
+SORT_FIELDS = ("price", "rating", "total_sold", "created_at")
+# (sort field, descending, cursor, limit, filters) -> page ids, dropped on every catalog change
+MEMO_SIZE = 1024
+
+def _row(doc: dict) -> dict:
+    row = filter_meta(doc)
+    row["rating"] = float(doc.get("rating") or 0)
+    row["total_sold"] = float(doc.get("total_sold") or 0)
+    row["created_at"] = doc.get("created_at") or ""
+    return row
+
+class TopKIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._rows: dict[str, dict] = {}
+        self._memo: dict[tuple, list[tuple[str, object]]] = {}
+
+    def __len__(self):
+        return len(self._rows)
+
+    def upsert(self, doc: dict):
+        pid = doc.get("id")
+        if not pid:
+            return
+        with self._lock:
+            self._rows[pid] = _row(doc)
+            self._memo.clear()
+
+    def remove(self, pid: str):
+        with self._lock:
+            if self._rows.pop(pid, None) is not None:
+                self._memo.clear()
+
+    def rebuild(self, docs):
+        rows = {d["id"]: _row(d) for d in docs if d.get("id")}
+        with self._lock:
+            self._rows = rows
+            self._memo = {}
+
+    def top(self, field: str, descending: bool, limit: int, after: tuple | None = None,
+            predicate=None, memo_key=None) -> list[tuple[str, object]]:
+        """
+        Up to `limit` (product_id, sort value) in (field, id) order, ascending or
+        descending like a Firestore order_by(field).order_by("__name__").
+        `after` is the (value, id) of the last row of the previous page.
+        """
+        key = (field, descending, after, limit, memo_key)
+        with self._lock:
+            if memo_key is not None:
+                hit = self._memo.get(key)
+                if hit is not None:
+                    return hit
+            rows = ((pid, r[field]) for pid, r in self._rows.items() if predicate is None or predicate(r))
+            if after is not None:
+                if descending:
+                    rows = ((pid, v) for pid, v in rows if (v, pid) < after)
+                else:
+                    rows = ((pid, v) for pid, v in rows if (v, pid) > after)
+            if descending:
+                out = heapq.nlargest(limit, rows, key=lambda x: (x[1], x[0]))
+            else:
+                out = heapq.nsmallest(limit, rows, key=lambda x: (x[1], x[0]))
+            if memo_key is not None:
+                if len(self._memo) >= MEMO_SIZE:
+                    self._memo.clear()
+                self._memo[key] = out
+            return out
+
+    def order(self, ids: list[str], field: str, descending: bool) -> list[str]:
+        """`ids` in (field, id) order; ids the index doesn't hold go last."""
+        with self._lock:
+            known = [(self._rows[pid][field], pid) for pid in ids if pid in self._rows]
+            missing = [pid for pid in ids if pid not in self._rows]
+        known.sort(reverse=descending)
+        return [pid for _, pid in known] + missing
+
+topk_index = TopKIndex()
@@ -0,0 +1,270 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+_MISSING = object()
+
+def approx_size(value) -> int:
+    """Rough deep size in bytes of JSON-like data (dicts, lists, scalars)."""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approx_size(k) + approx_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set)):
+        size += sum(approx_size(v) for v in value)
+    return size
+
+class TTLCache:
+    """
+    Small thread-safe LRU map with a per-entry absolute expiry (epoch seconds).
+    Oldest entries are evicted once maxsize is reached, or once the summed
+    sizeof(value) of all entries exceeds maxbytes when a byte budget is given.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float | None = None,
+                 maxbytes: int | None = None, sizeof=approx_size):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.maxbytes = maxbytes
+        self._sizeof = sizeof
+        self._bytes = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def _drop(self, key):
+        entry = self._data.pop(key)
+        self._bytes -= entry[2]
+        return entry
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            value, expires_at, _ = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._drop(key)
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, expires_at: float | None = None):
+        if expires_at is None and self.ttl is not None:
+            expires_at = time.time() + self.ttl
+        nbytes = self._sizeof(value) if self.maxbytes is not None else 0
+        with self._lock:
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (value, expires_at, nbytes)
+            self._bytes += nbytes
+            while len(self._data) > self.maxsize or (
+                    self.maxbytes is not None and self._bytes > self.maxbytes and len(self._data) > 1):
+                self._drop(next(iter(self._data)))
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._drop(key)[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._data)
+
+
+class AsyncLoadingCache:
+    """
+    Read-through TTLCache for async loaders. Concurrent misses for one key
+    share a single load; get_many() fetches all of its misses with one
+    load_many(keys) -> {key: value} when given. invalidate() drops the entry
+    and any load in flight, so a slow read can't put stale data back. None
+    results are cached for negative_ttl seconds (0 disables). Cached values
+    are shared: don't mutate.
+    """
+
+    def __init__(self, load, maxsize: int = 1024, ttl: float | None = None, negative_ttl: float = 0,
+                 maxbytes: int | None = None, sizeof=approx_size, load_many=None):
+        self._load = load
+        self._load_many = load_many
+        self._cache = TTLCache(maxsize, ttl, maxbytes=maxbytes, sizeof=sizeof)
+        self._negative_ttl = negative_ttl
+        self._inflight: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    async def get(self, key):
+        return (await self.get_many([key]))[key]
+
+    async def get_many(self, keys) -> dict:
+        out, waits, missing = {}, {}, []
+        for key in dict.fromkeys(keys):
+            value = self._cache.get(key, _MISSING)
+            if value is not _MISSING:
+                self.hits += 1
+                out[key] = value
+                continue
+            task = self._inflight.get(key)
+            if task is None:
+                self.misses += 1
+                missing.append(key)
+            else:
+                self.coalesced += 1
+                waits[key] = task
+        if missing:
+            task = asyncio.ensure_future(self._fill(missing))
+            for key in missing:
+                self._inflight[key] = waits[key] = task
+        for key, task in waits.items():
+            # shield: a cancelled caller must not cancel the load other callers wait on
+            out[key] = (await asyncio.shield(task)).get(key)
+        return out
+
+    async def _fill(self, keys: list) -> dict:
+        me = asyncio.current_task()
+        try:
+            if self._load_many is not None and len(keys) > 1:
+                values = await self._load_many(keys)
+            else:
+                values = dict(zip(keys, await asyncio.gather(*(self._load(k) for k in keys))))
+            for key in keys:
+                value = values.get(key)
+                if self._inflight.get(key) is not me:
+                    continue
+                if value is None:
+                    if self._negative_ttl:
+                        self._cache.set(key, None, expires_at=time.time() + self._negative_ttl)
+                else:
+                    self._cache.set(key, value)
+            return values
+        finally:
+            for key in keys:
+                if self._inflight.get(key) is me:
+                    del self._inflight[key]
+
+    def invalidate(self, key):
+        self._cache.pop(key)
+        self._inflight.pop(key, None)
+
+    def clear(self):
+        self._cache.clear()
+        self._inflight.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._cache),
+            "bytes": self._cache.nbytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "hit_rate": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
+
+
+class StaleWhileRevalidateCache:
+    """
+    Async cache for values that may be served somewhat old. An entry is fresh
+    for `ttl` seconds and then stale for `stale_ttl` more: a stale hit returns
+    the old value at once and reloads it in the background, one reload per key.
+    Past that a caller waits for the load (shared by concurrent callers), but
+    while an older value is held (up to `stale_if_error` seconds past the stale
+    window) a load that fails or takes longer than `timeout` gets the old value
+    served instead. After invalidate(group) the group's entries are reloaded
+    on their next read, which waits for it like a miss (same timeout and
+    old-value fallback), so this worker's writes show up at once; reloads that
+    started before the invalidation aren't joined. Keys are tuples whose first
+    item is the group.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 30, stale_ttl: float = 300,
+                 stale_if_error: float = 3600, timeout: float = 2.0, maxbytes: int | None = None,
+                 sizeof=approx_size):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.stale_if_error = stale_if_error
+        self.timeout = timeout
+        # entries are (value, stored_at); sizes are measured on the value alone
+        self._cache = TTLCache(maxsize, maxbytes=maxbytes, sizeof=lambda e: sizeof(e[0]))
+        self._inflight: dict = {}
+        self._invalidated: dict = {}
+        self.hits = 0
+        self.stale = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _reload(self, key, load, since: float = 0) -> asyncio.Task:
+        # a reload running since before `since` (an invalidation) may return old data
+        running = self._inflight.get(key)
+        if running is not None and running[1] >= since:
+            return running[0]
+        started = time.time()
+        task = asyncio.ensure_future(self._run(key, load, started))
+        self._inflight[key] = (task, started)
+        # background reloads may fail unobserved; the next miss reports it
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        return task
+
+    async def _run(self, key, load, started: float):
+        try:
+            value = await load()
+            if started >= self._invalidated.get(key[0], 0):
+                self._cache.set(key, (value, started), expires_at=started + self.ttl + self.stale_ttl +
+                                self.stale_if_error)
+            return value
+        finally:
+            running = self._inflight.get(key)
+            if running is not None and running[0] is asyncio.current_task():
+                del self._inflight[key]
+
+    async def get(self, key, load):
+        """Cached value for `key`; `load` is an argument-less coroutine function."""
+        entry = self._cache.get(key)
+        invalidated = self._invalidated.get(key[0], 0)
+        if entry is not None and entry[1] >= invalidated:
+            value, stored_at = entry
+            age = time.time() - stored_at
+            if age < self.ttl:
+                self.hits += 1
+                return value
+            if age < self.ttl + self.stale_ttl:
+                self.stale += 1
+                self._reload(key, load)
+                return value
+        self.misses += 1
+        task = self._reload(key, load, invalidated)
+        if entry is None:
+            return await asyncio.shield(task)
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), self.timeout)
+        except Exception:
+            # loader down or slow: the old value beats an error
+            self.errors += 1
+            return entry[0]
+
+    def invalidate(self, group):
+        self._invalidated[group] = time.time()
+
+    def clear(self):
+        self._cache.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.stale + self.misses
+        return {
+            "size": len(self._cache),
+            "bytes": self._cache.nbytes,
+            "hits": self.hits,
+            "stale": self.stale,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_rate": round((self.hits + self.stale) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,27 @@
+import time
+from firebase_admin import auth
+from starlette.concurrency import run_in_threadpool
+from .deps import mark_claims_changed
+
+# authorization state mirrored from users/{uid} and seller_profiles/{uid} into the ID token
+CLAIM_KEYS = ("role", "status", "approval_status")
+
+def _write_claims(uid: str, changes: dict, revoke: bool) -> dict:
+    current = auth.get_user(uid).custom_claims or {}
+    claims = {**current, **{k: v for k, v in changes.items() if k in CLAIM_KEYS}}
+    claims["claims_at"] = int(time.time())
+    auth.set_custom_user_claims(uid, claims)
+    if revoke:
+        auth.revoke_refresh_tokens(uid)
+    return claims
+
+async def sync_user_claims(uid: str, revoke: bool = False, **changes) -> dict:
+    """
+    Merge role/status/approval_status into the user's custom claims.
+    Clients must refresh their ID token to pick them up; revoke=True also revokes
+    refresh tokens (use for downgrades: suspension, rejection).
+    """
+    # firebase_admin.auth is blocking
+    claims = await run_in_threadpool(_write_claims, uid, changes, revoke)
+    mark_claims_changed(uid, claims["claims_at"])
+    return claims
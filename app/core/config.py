@@ -4,6 +4,25 @@ class Settings(BaseSettings):
     FIREBASE_SERVICE_ACCOUNT: str
     FIREBASE_WEB_API_KEY: str
     ALLOWED_ORIGINS: str = "http://localhost:5173"
+    AUTH_CACHE_SIZE: int = 10000
+    AUTH_CACHE_MAX_TTL: int = 300
+    CATALOG_REFRESH_SECONDS: int = 300
+    PRODUCT_CACHE_SIZE: int = 5000
+    PRODUCT_CACHE_TTL: int = 60
+    PRODUCT_CACHE_MAX_MB: int = 32
+    BLOG_CACHE_SIZE: int = 1000
+    BLOG_CACHE_TTL: int = 300
+    NOT_FOUND_CACHE_TTL: int = 5  # missing products/blogs/slugs are remembered this long
+    RESPONSE_CACHE_SIZE: int = 2000
+    RESPONSE_CACHE_TTL: int = 30
+    RESPONSE_CACHE_STALE_SECONDS: int = 300
+    RESPONSE_CACHE_MAX_MB: int = 32
+    CATALOG_REPLICA: bool = False
+    CART_STORAGE: str = "lines"  # lines | document
+    # order pricing, applied server-side
+    DELIVERY_FEE: float = 0
+    FREE_DELIVERY_MIN_SUBTOTAL: float | None = None
+    TAX_RATE: float = 0  # fraction of the subtotal, e.g. 0.05
 
     class Config:
         env_file = ".env"
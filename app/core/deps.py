@@ -1,29 +1,114 @@
-from fastapi import Depends, Header, HTTPException, status
+import hashlib
+import time
+from fastapi import Depends, Header, HTTPException, Response, status
 from firebase_admin import auth
-from .firebase import db
+from starlette.concurrency import run_in_threadpool
+from .firebase import adb
+from .cache import TTLCache
+from .config import settings
 
-def get_current_user(authorization: str = Header(...)) -> dict:
+# verified tokens by sha256(token), role/status and seller approval by uid; entries expire at the
+# token's exp (user and approval entries are additionally capped at AUTH_CACHE_MAX_TTL so other
+# workers converge)
+_token_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE)
+_user_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE)
+# kept apart from _user_cache: on the claims path there is no user entry to attach it to
+_approval_cache = TTLCache(maxsize=settings.AUTH_CACHE_SIZE)
+# uid -> claims_at of the latest claims written by this worker; ID tokens live at most 1h
+_claims_changed = TTLCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=3600)
+
+REFRESH_HEADER = "X-Id-Token-Refresh"
+
+def _entry_expiry(exp=None) -> float:
+    cap = time.time() + settings.AUTH_CACHE_MAX_TTL
+    return min(float(exp), cap) if exp else cap
+
+def invalidate_user_cache(uid: str):
+    # call after changing role/status/approval so the next request re-reads it
+    _user_cache.pop(uid)
+    _approval_cache.pop(uid)
+
+def mark_claims_changed(uid: str, claims_at: int):
+    # tokens minted before claims_at carry outdated claims
+    _claims_changed.set(uid, claims_at)
+    invalidate_user_cache(uid)
+
+def _claims_usable(decoded: dict) -> bool:
+    if "role" not in decoded or "status" not in decoded:
+        return False
+    changed_at = _claims_changed.get(decoded["uid"])
+    return changed_at is None or int(decoded.get("claims_at") or 0) >= changed_at
+
+def _claims_fresh(decoded: dict) -> bool:
+    # claims are trusted for AUTH_CACHE_MAX_TTL after the token was minted, the same bound as the
+    # user cache, so a change made on another worker takes effect within that time
+    return time.time() - float(decoded.get("iat") or 0) <= settings.AUTH_CACHE_MAX_TTL
+
+async def _load_user_state(uid: str, exp=None) -> dict:
+    cached = _user_cache.get(uid)
+    if cached is None:
+        udoc = await adb().collection("users").document(uid).get()
+        role = "user"
+        status_ = "active"
+        if udoc.exists:
+            data = udoc.to_dict() or {}
+            role = data.get("role", "user")
+            status_ = data.get("status", "active")
+        cached = {"role": role, "status": status_, "expires_at": _entry_expiry(exp)}
+        _user_cache.set(uid, cached, expires_at=cached["expires_at"])
+    return cached
+
+async def _load_approval_status(uid: str):
+    cached = _approval_cache.get(uid)
+    if cached is not None:
+        return cached["approval_status"]
+    sdoc = await adb().collection("seller_profiles").document(uid).get()
+    if not sdoc.exists:
+        raise HTTPException(403, detail="Seller profile missing")
+    approval = (sdoc.to_dict() or {}).get("approval_status")
+    _approval_cache.set(uid, {"approval_status": approval}, expires_at=_entry_expiry())
+    return approval
+
+async def get_current_user(response: Response, authorization: str = Header(...)) -> dict:
     if not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Missing Bearer token")
     token = authorization.replace("Bearer ", "").strip()
-    try:
-        decoded = auth.verify_id_token(token)
-    except Exception:
-        raise HTTPException(status_code=401, detail="Invalid/expired token")
+    token_key = hashlib.sha256(token.encode()).hexdigest()
+
+    decoded = _token_cache.get(token_key)
+    if decoded is None:
+        try:
+            decoded = await run_in_threadpool(auth.verify_id_token, token)
+        except Exception:
+            raise HTTPException(status_code=401, detail="Invalid/expired token")
+        _token_cache.set(token_key, decoded, expires_at=float(decoded.get("exp") or 0))
 
     uid = decoded["uid"]
-    udoc = db().collection("users").document(uid).get()
-    role = "user"
-    status_ = "active"
-    if udoc.exists:
-        data = udoc.to_dict() or {}
-        role = data.get("role", "user")
-        status_ = data.get("status", "active")
+    usable = _claims_usable(decoded)
+    if usable and _claims_fresh(decoded):
+        # custom claims (see app.core.claims): no database read
+        return {
+            "uid": uid,
+            "email": decoded.get("email"),
+            "role": decoded["role"],
+            "status": decoded["status"],
+            "approval_status": decoded.get("approval_status"),
+        }
 
-    return {"uid": uid, "email": decoded.get("email"), "role": role, "status": status_}
+    # older token: users/{uid} through the user cache; legacy token or claims changed since it
+    # was minted: the same, and ask the client to refresh
+    if not usable:
+        response.headers[REFRESH_HEADER] = "required"
+    state = await _load_user_state(uid, decoded.get("exp"))
+    return {"uid": uid, "email": decoded.get("email"), "role": state["role"], "status": state["status"],
+            "approval_status": None}
 
 def require_roles(*roles: str):
-    def _dep(user=Depends(get_current_user)):
+    async def _dep(user=Depends(get_current_user)):
+        if user.get("status") != "active" or user.get("role") not in roles:
+            # claims may lag behind an upgrade made on another worker; confirm before denying
+            state = await _load_user_state(user["uid"])
+            user = {**user, "role": state["role"], "status": state["status"]}
         if user.get("status") != "active":
             raise HTTPException(status_code=403, detail=f"Account status: {user.get('status')}")
         if user.get("role") not in roles:
@@ -31,14 +116,14 @@ def require_roles(*roles: str):
         return user
     return _dep
 
-def require_seller_approved(user=Depends(require_roles("seller", "admin"))):
+async def require_seller_approved(user=Depends(require_roles("seller", "admin"))):
     # Admin bypass
     if user["role"] == "admin":
         return user
-    sdoc = db().collection("seller_profiles").document(user["uid"]).get()
-    if not sdoc.exists:
-        raise HTTPException(403, detail="Seller profile missing")
-    sdata = sdoc.to_dict() or {}
-    if sdata.get("approval_status") != "approved":
-        raise HTTPException(403, detail=f"Seller not approved: {sdata.get('approval_status')}")
+    approval = user.get("approval_status")
+    if approval != "approved":
+        # same as roles: only a would-be denial goes back to seller_profiles
+        approval = await _load_approval_status(user["uid"])
+    if approval != "approved":
+        raise HTTPException(403, detail=f"Seller not approved: {approval}")
     return user
@@ -1,8 +1,9 @@
 import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from firebase_admin import credentials, firestore, firestore_async, auth
 from .config import settings
 
 _db = None
+_adb = None
 
 def init_firebase():
     global _db
@@ -18,5 +19,14 @@ def db():
         _db = init_firebase()
     return _db
 
+def adb():
+    # AsyncClient for request handlers; create it from inside the running event loop
+    global _adb
+    if _adb is None:
+        if not firebase_admin._apps:
+            init_firebase()
+        _adb = firestore_async.client()
+    return _adb
+
 def firebase_auth():
     return auth
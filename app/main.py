@@ -1,14 +1,19 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
-from app.core.firebase import init_firebase
+from app.core.firebase import init_firebase, adb
+from starlette.concurrency import run_in_threadpool
+from app.catalog import sync as catalog_sync
+from app.catalog.replica import replica
 
 from app.routers import (
     auth, products, orders, blogs, profile, sellers, admin,
-    cart, payments, site_content, reviews, education
+    cart, payments, site_content, reviews, education, home
 )
 
 app = FastAPI(title="FastAPI + Firebase Ecommerce", version="1.0.0")
+_background: list[asyncio.Task] = []
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,11 +21,29 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Id-Token-Refresh"],
 )
 
 @app.on_event("startup")
-def _startup():
+async def _startup():
     init_firebase()
+    adb()
+    # in-memory search indexes over products; the replica's listener keeps them
+    # current, otherwise they are reloaded periodically
+    if settings.CATALOG_REPLICA:
+        live = await run_in_threadpool(replica.start)
+        _background.append(asyncio.create_task(replica.supervise(settings.CATALOG_REFRESH_SECONDS)))
+        if not live:
+            await catalog_sync.load_catalog()
+        return
+    await catalog_sync.load_catalog()
+    _background.append(asyncio.create_task(catalog_sync.refresh_loop()))
+
+@app.on_event("shutdown")
+async def _shutdown():
+    for task in _background:
+        task.cancel()
+    replica.stop()
 
 app.include_router(auth.router, prefix="/api/auth", tags=["Auth"])
 app.include_router(products.router, prefix="/api/products", tags=["Products"])
@@ -34,3 +57,4 @@ app.include_router(payments.router, prefix="/api/payment-methods", tags=["Paymen
 app.include_router(site_content.router, prefix="/api/site-content", tags=["Site Content"])
 app.include_router(reviews.router, prefix="/api/reviews", tags=["Reviews"])
 app.include_router(education.router, prefix="/api/education", tags=["BSF Education"])
+app.include_router(home.router, prefix="/api/home", tags=["Home"])
@@ -1,23 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.core.firebase import db
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query
+from app.core.firebase import adb
 from app.core.utils import now_iso
 from app.core.deps import require_roles
+from app.core.claims import sync_user_claims
+from app.core.cache import TTLCache
+from app.catalog.product_cache import product_cache
+from app.utils.response_cache import public_cache
+from app.services import cart_store, ratings, seller_stats, unique_keys
+from app.utils.firestore_helpers import paginate, count, total, DESC
 
 router = APIRouter()
 
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+ORDER_STATUSES = ("pending", "confirmed", "packed", "shipped", "delivered", "cancelled", "refunded")
+APPROVAL_STATUSES = ("pending", "approved", "rejected")
+# dashboard numbers may lag writes by this much; keyed by the breakdown flag
+STATS_TTL = 30
+_stats_cache = TTLCache(maxsize=2, ttl=STATS_TTL)
+
 @router.get("/sellers")
-def get_all_sellers(user=Depends(require_roles("admin"))):
-    docs = db().collection("seller_profiles").stream()
-    return {"items": [d.to_dict() for d in docs]}
+async def get_all_sellers(
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    user=Depends(require_roles("admin"))
+):
+    return await paginate(adb().collection("seller_profiles"), [("created_at", DESC)], limit, cursor)
 
 @router.patch("/sellers/{id}/approve")
-def approve_seller(id: str, user=Depends(require_roles("admin"))):
+async def approve_seller(id: str, user=Depends(require_roles("admin"))):
     t = now_iso()
-    sdoc = db().collection("seller_profiles").document(id).get()
+    sdoc = await adb().collection("seller_profiles").document(id).get()
     if not sdoc.exists:
         raise HTTPException(404, detail="Seller profile not found")
 
-    db().collection("seller_profiles").document(id).set({
+    await adb().collection("seller_profiles").document(id).set({
         "approval_status": "approved",
         "rejection_reason": None,
         "is_verified": True,
@@ -25,47 +44,102 @@ def approve_seller(id: str, user=Depends(require_roles("admin"))):
     }, merge=True)
 
     # ensure users role seller + active
-    db().collection("users").document(id).set({
+    await adb().collection("users").document(id).set({
         "role": "seller",
         "status": "active",
         "updated_at": t
     }, merge=True)
+    await sync_user_claims(id, role="seller", status="active", approval_status="approved")
+    _stats_cache.clear()
 
     return {"message": "Seller approved"}
 
 @router.patch("/sellers/{id}/reject")
-def reject_seller(id: str, payload: dict, user=Depends(require_roles("admin"))):
+async def reject_seller(id: str, payload: dict, user=Depends(require_roles("admin"))):
     t = now_iso()
     reason = payload.get("rejection_reason") or payload.get("reason")
 
-    db().collection("seller_profiles").document(id).set({
+    await adb().collection("seller_profiles").document(id).set({
         "approval_status": "rejected",
         "rejection_reason": reason,
         "updated_at": t
     }, merge=True)
+    await sync_user_claims(id, revoke=True, approval_status="rejected")
+    _stats_cache.clear()
 
     return {"message": "Seller rejected"}
 
 @router.patch("/sellers/{id}/status")
-def update_seller_status(id: str, payload: dict, user=Depends(require_roles("admin"))):
+async def update_seller_status(id: str, payload: dict, user=Depends(require_roles("admin"))):
     t = now_iso()
     status_ = payload.get("status")
     if not status_:
         raise HTTPException(400, detail="status required")
 
     # status in users table
-    db().collection("users").document(id).set({"status": status_, "updated_at": t}, merge=True)
+    await adb().collection("users").document(id).set({"status": status_, "updated_at": t}, merge=True)
+    await sync_user_claims(id, revoke=status_ != "active", status=status_)
     return {"message": "Seller user status updated", "status": status_}
 
+@router.post("/seller-stats/rebuild")
+async def rebuild_seller_stats(seller_id: str | None = None, user=Depends(require_roles("admin"))):
+    # backfill / repair of the materialized seller_stats documents
+    if seller_id:
+        return await seller_stats.rebuild(seller_id)
+    return {"rebuilt": await seller_stats.rebuild_all()}
+
+@router.post("/ratings/rebuild")
+async def rebuild_ratings(user=Depends(require_roles("admin"))):
+    # backfill of the product/seller rating shards and histograms from all reviews
+    return await ratings.rebuild()
+
+@router.get("/cache-stats")
+async def cache_stats(user=Depends(require_roles("admin"))):
+    # per worker
+    return {"products": product_cache.stats(), "responses": public_cache.stats()}
+
+@router.post("/carts/migrate")
+async def migrate_carts(user=Depends(require_roles("admin"))):
+    # cart_items rows -> carts/{userId} documents (CART_STORAGE=document)
+    return await cart_store.migrate_all()
+
+@router.post("/unique-keys/rebuild")
+async def rebuild_unique_keys(user=Depends(require_roles("admin"))):
+    # backfill of the slug/SKU reservation documents; reports existing duplicates
+    return await unique_keys.rebuild()
+
 @router.get("/stats")
-def admin_dashboard_stats(user=Depends(require_roles("admin"))):
-    # simple counts (for big scale use aggregation)
-    return {
-        "users": len(list(db().collection("users").stream())),
-        "user_profiles": len(list(db().collection("user_profiles").stream())),
-        "sellers": len(list(db().collection("seller_profiles").stream())),
-        "products": len(list(db().collection("products").stream())),
-        "orders": len(list(db().collection("orders").stream())),
-        "blogs": len(list(db().collection("blogs").stream())),
-        "reviews": len(list(db().collection("reviews").stream())),
+async def admin_dashboard_stats(breakdown: bool = False, user=Depends(require_roles("admin"))):
+    # aggregation queries: counts and the revenue sum are computed server-side.
+    # Revenue is delivered orders: the status is only moved there by the seller
+    # or an admin, while nothing confirms payment_status yet
+    cached = _stats_cache.get(breakdown)
+    if cached is not None:
+        return cached
+
+    names = {
+        "users": "users",
+        "user_profiles": "user_profiles",
+        "sellers": "seller_profiles",
+        "products": "products",
+        "orders": "orders",
+        "blogs": "blogs",
+        "reviews": "reviews",
     }
+    orders = adb().collection("orders")
+    sellers = adb().collection("seller_profiles")
+    jobs = [count(adb().collection(c)) for c in names.values()]
+    jobs.append(total(orders.where("status", "==", seller_stats.COMPLETED_STATUS), "total_amount"))
+    if breakdown:
+        jobs += [count(orders.where("status", "==", s)) for s in ORDER_STATUSES]
+        jobs += [count(sellers.where("approval_status", "==", s)) for s in APPROVAL_STATUSES]
+    results = await asyncio.gather(*jobs)
+
+    out = dict(zip(names, results))
+    out["revenue"] = round(results[len(names)], 2)
+    if breakdown:
+        rest = results[len(names) + 1:]
+        out["orders_by_status"] = dict(zip(ORDER_STATUSES, rest))
+        out["sellers_by_approval"] = dict(zip(APPROVAL_STATUSES, rest[len(ORDER_STATUSES):]))
+    _stats_cache.set(breakdown, out)
+    return out
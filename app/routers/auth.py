@@ -1,11 +1,14 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
 import httpx
 from firebase_admin import auth
+from starlette.concurrency import run_in_threadpool
 
 from app.core.config import settings
-from app.core.firebase import db
+from app.core.firebase import adb
 from app.core.utils import now_iso
 from app.core.deps import get_current_user
+from app.core.claims import sync_user_claims
 
 router = APIRouter()
 
@@ -19,7 +22,7 @@ async def firebase_password_login(email: str, password: str):
     return r.json()
 
 @router.post("/register")
-def user_register(payload: dict):
+async def user_register(payload: dict):
     # Required: email, password, full_name (phone optional)
     email = payload.get("email")
     password = payload.get("password")
@@ -29,11 +32,11 @@ def user_register(payload: dict):
     if not email or not password or not full_name:
         raise HTTPException(400, detail="email, password, full_name are required")
 
-    user = auth.create_user(email=email, password=password, display_name=full_name)
+    user = await run_in_threadpool(auth.create_user, email=email, password=password, display_name=full_name)
     uid = user.uid
     t = now_iso()
 
-    db().collection("users").document(uid).set({
+    await adb().collection("users").document(uid).set({
         "id": uid,
         "email": email,
         "password_hash": None,
@@ -47,7 +50,7 @@ def user_register(payload: dict):
         "updated_at": t
     })
 
-    db().collection("user_profiles").document(uid).set({
+    await adb().collection("user_profiles").document(uid).set({
         "id": uid,
         "user_id": uid,
         "avatar_url": None,
@@ -58,6 +61,7 @@ def user_register(payload: dict):
         "created_at": t,
         "updated_at": t
     })
+    await sync_user_claims(uid, role="user", status="active")
 
     return {"message": "User registered", "id": uid}
 
@@ -73,7 +77,10 @@ async def user_login(payload: dict):
 async def admin_login(payload: dict):
     res = await user_login(payload)
     uid = res.get("localId")
-    udoc = db().collection("users").document(uid).get()
+    udoc, adoc = await asyncio.gather(
+        adb().collection("users").document(uid).get(),
+        adb().collection("admin_users").document(uid).get(),
+    )
     if not udoc.exists:
         raise HTTPException(403, detail="Not an admin")
     u = udoc.to_dict() or {}
@@ -81,9 +88,8 @@ async def admin_login(payload: dict):
         raise HTTPException(403, detail="Not an admin")
 
     # optional: ensure admin_users exists
-    adoc = db().collection("admin_users").document(uid).get()
     if not adoc.exists:
-        db().collection("admin_users").document(uid).set({
+        await adb().collection("admin_users").document(uid).set({
             "id": uid,
             "user_id": uid,
             "permissions": [],
@@ -92,12 +98,12 @@ async def admin_login(payload: dict):
             "updated_at": now_iso()
         }, merge=True)
     else:
-        db().collection("admin_users").document(uid).set({"last_login": now_iso(), "updated_at": now_iso()}, merge=True)
+        await adb().collection("admin_users").document(uid).set({"last_login": now_iso(), "updated_at": now_iso()}, merge=True)
 
     return res
 
 @router.post("/seller/register")
-def seller_register(payload: dict):
+async def seller_register(payload: dict):
     # Required: email, password, full_name, farm_name (others optional)
     email = payload.get("email")
     password = payload.get("password")
@@ -108,11 +114,11 @@ def seller_register(payload: dict):
     if not email or not password or not full_name or not farm_name:
         raise HTTPException(400, detail="email, password, full_name, farm_name required")
 
-    user = auth.create_user(email=email, password=password, display_name=full_name)
+    user = await run_in_threadpool(auth.create_user, email=email, password=password, display_name=full_name)
     uid = user.uid
     t = now_iso()
 
-    db().collection("users").document(uid).set({
+    await adb().collection("users").document(uid).set({
         "id": uid,
         "email": email,
         "password_hash": None,
@@ -126,7 +132,7 @@ def seller_register(payload: dict):
         "updated_at": t
     })
 
-    db().collection("seller_profiles").document(uid).set({
+    await adb().collection("seller_profiles").document(uid).set({
         "id": uid,
         "user_id": uid,
         "farm_name": farm_name,
@@ -152,6 +158,7 @@ def seller_register(payload: dict):
         "created_at": t,
         "updated_at": t
     })
+    await sync_user_claims(uid, role="seller", status="active", approval_status="pending")
 
     return {"message": "Seller registered (pending approval)", "id": uid}
 
@@ -159,14 +166,16 @@ def seller_register(payload: dict):
 async def seller_login(payload: dict):
     res = await user_login(payload)
     uid = res.get("localId")
-    udoc = db().collection("users").document(uid).get()
+    udoc, sdoc = await asyncio.gather(
+        adb().collection("users").document(uid).get(),
+        adb().collection("seller_profiles").document(uid).get(),
+    )
     if not udoc.exists:
         raise HTTPException(403, detail="Not a seller")
     u = udoc.to_dict() or {}
     if u.get("role") != "seller":
         raise HTTPException(403, detail="Not a seller")
 
-    sdoc = db().collection("seller_profiles").document(uid).get()
     if not sdoc.exists:
         raise HTTPException(403, detail="Seller profile missing")
     s = sdoc.to_dict() or {}
@@ -175,18 +184,18 @@ async def seller_login(payload: dict):
     return res
 
 @router.post("/google")
-def google_oauth(payload: dict):
+async def google_oauth(payload: dict):
     # payload: { idToken: "<firebase-id-token>" } (client already did Google sign-in)
     id_token = payload.get("idToken")
     if not id_token:
         raise HTTPException(400, detail="idToken required")
-    decoded = auth.verify_id_token(id_token)
+    decoded = await run_in_threadpool(auth.verify_id_token, id_token)
     uid = decoded["uid"]
     t = now_iso()
 
-    uref = db().collection("users").document(uid)
-    if not uref.get().exists:
-        uref.set({
+    uref = adb().collection("users").document(uid)
+    if not (await uref.get()).exists:
+        await uref.set({
             "id": uid,
             "email": decoded.get("email"),
             "password_hash": None,
@@ -199,7 +208,7 @@ def google_oauth(payload: dict):
             "created_at": t,
             "updated_at": t
         })
-        db().collection("user_profiles").document(uid).set({
+        await adb().collection("user_profiles").document(uid).set({
             "id": uid,
             "user_id": uid,
             "avatar_url": decoded.get("picture"),
@@ -210,17 +219,34 @@ def google_oauth(payload: dict):
             "created_at": t,
             "updated_at": t
         })
+        await sync_user_claims(uid, role="user", status="active")
     else:
-        uref.set({"updated_at": t}, merge=True)
+        await uref.set({"updated_at": t}, merge=True)
 
     return {"message": "Google OAuth success", "id": uid}
 
 @router.post("/logout")
-def logout(user=Depends(get_current_user)):
+async def logout(user=Depends(get_current_user)):
     # revoke refresh tokens (client should also signOut)
-    auth.revoke_refresh_tokens(user["uid"])
+    await run_in_threadpool(auth.revoke_refresh_tokens, user["uid"])
     return {"message": "Logged out (tokens revoked)"}
 
+@router.post("/claims/refresh")
+async def refresh_claims(user=Depends(get_current_user)):
+    # re-derive claims from users/seller_profiles (e.g. accounts created before claims existed);
+    # client then calls getIdToken(true)
+    uid = user["uid"]
+    udoc, sdoc = await asyncio.gather(
+        adb().collection("users").document(uid).get(),
+        adb().collection("seller_profiles").document(uid).get(),
+    )
+    u = udoc.to_dict() if udoc.exists else {}
+    changes = {"role": u.get("role", "user"), "status": u.get("status", "active")}
+    if changes["role"] == "seller":
+        changes["approval_status"] = (sdoc.to_dict() or {}).get("approval_status") if sdoc.exists else None
+    claims = await sync_user_claims(uid, **changes)
+    return {"message": "Claims refreshed; refresh your ID token", "claims": claims}
+
 @router.get("/me")
-def me(user=Depends(get_current_user)):
+async def me(user=Depends(get_current_user)):
     return user
@@ -1,38 +1,64 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.core.firebase import db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from firebase_admin import firestore_async
+from google.api_core.exceptions import AlreadyExists
+from app.core.firebase import adb
 from app.core.utils import gen_uuid, now_iso
 from app.core.deps import require_roles
+from app.services import unique_keys
+from app.services.unique_keys import BLOG_KEYS
+from app.services.slugs import blog_slugs
+from app.services.blog_cache import blog_cache
+from app.utils.firestore_helpers import paginate, parse_fields, DESC
+from app.utils.conditional import conditional
+from app.utils.response_cache import cached, invalidate
 
 router = APIRouter()
 
-def _ensure_unique_slug(slug: str, exclude_id: str | None = None):
-    q = db().collection("blogs").where("slug", "==", slug).limit(1).stream()
-    for d in q:
-        if exclude_id and d.id == exclude_id:
-            continue
-        raise HTTPException(409, detail="slug must be unique")
+PAGE_SIZE = 12
+MAX_PAGE_SIZE = 50
+# blog index cards: everything but the article body and SEO fields
+SUMMARY_FIELDS = ("id", "author_id", "title", "slug", "excerpt", "featured_image", "category", "tags",
+                  "status", "view_count", "published_at", "created_at", "updated_at")
+
+async def published_page(limit: int, cursor: str | None, fields: list[str] | None) -> dict:
+    q = adb().collection("blogs").where("status", "==", "published")
+    return await paginate(q, [("created_at", DESC)], limit, cursor, fields)
 
 @router.get("")
-def get_all_blogs():
+async def get_all_blogs(
+    request: Request,
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None
+):
     # public: published only
-    docs = db().collection("blogs").where("status", "==", "published").stream()
-    return {"items": [d.to_dict() for d in docs]}
+    projection = parse_fields(fields, SUMMARY_FIELDS)
+
+    async def _load():
+        return await published_page(limit, cursor, projection)
+
+    params = {"fields": tuple(projection) if projection is not None else None, "limit": limit, "cursor": cursor}
+    return await cached(request, "blogs", params, _load)
+
+@router.get("/by-slug/{slug}")
+async def get_blog_by_slug(slug: str, request: Request):
+    doc = await blog_slugs.lookup(slug, blog_cache)
+    if doc is None:
+        raise HTTPException(404, detail="Blog not found")
+    return conditional(request, doc, doc.get("updated_at"))
 
 @router.get("/{id}")
-def get_blog_by_id(id: str):
-    doc = db().collection("blogs").document(id).get()
-    if not doc.exists:
+async def get_blog_by_id(id: str, request: Request):
+    doc = await blog_cache.get(id)
+    if doc is None:
         raise HTTPException(404, detail="Blog not found")
-    return doc.to_dict()
+    return conditional(request, doc, doc.get("updated_at"))
 
 @router.post("")
-def create_blog(payload: dict, user=Depends(require_roles("admin"))):
+async def create_blog(payload: dict, user=Depends(require_roles("admin"))):
     t = now_iso()
     bid = gen_uuid()
     slug = payload.get("slug")
-    if slug:
-        _ensure_unique_slug(slug)
-
     doc = {
         "id": bid,
         "author_id": user["uid"],
@@ -52,26 +78,64 @@ def create_blog(payload: dict, user=Depends(require_roles("admin"))):
         "created_at": t,
         "updated_at": t
     }
-    db().collection("blogs").document(bid).set(doc)
+    await unique_keys.check(BLOG_KEYS, bid, doc)
+    batch = adb().batch()
+    unique_keys.claim(batch, BLOG_KEYS, bid, doc)
+    batch.set(adb().collection("blogs").document(bid), doc)
+    try:
+        await batch.commit()
+    except AlreadyExists:
+        raise await unique_keys.conflict(BLOG_KEYS, bid, doc)
+    blog_slugs.put(bid, slug)
+    blog_cache.invalidate(bid)
+    invalidate("blogs")
     return {"message": "Blog created", "id": bid}
 
 @router.put("/{id}")
-def update_blog(id: str, payload: dict, user=Depends(require_roles("admin"))):
-    if payload.get("slug"):
-        _ensure_unique_slug(payload["slug"], exclude_id=id)
+async def update_blog(id: str, payload: dict, user=Depends(require_roles("admin"))):
+    await unique_keys.check(BLOG_KEYS, id, payload)
     payload["updated_at"] = now_iso()
-    db().collection("blogs").document(id).set(payload, merge=True)
+    ref = adb().collection("blogs").document(id)
+
+    @firestore_async.async_transactional
+    async def _update(transaction):
+        snap = await ref.get(transaction=transaction)
+        unique_keys.claim(transaction, BLOG_KEYS, id, payload, snap.to_dict() or {})
+        transaction.set(ref, payload, merge=True)
+
+    try:
+        await _update(adb().transaction())
+    except AlreadyExists:
+        raise await unique_keys.conflict(BLOG_KEYS, id, payload)
+    if "slug" in payload:
+        blog_slugs.put(id, payload["slug"])
+    blog_cache.invalidate(id)
+    invalidate("blogs")
     return {"message": "Blog updated"}
 
 @router.delete("/{id}")
-def delete_blog(id: str, user=Depends(require_roles("admin"))):
-    db().collection("blogs").document(id).delete()
+async def delete_blog(id: str, user=Depends(require_roles("admin"))):
+    ref = adb().collection("blogs").document(id)
+
+    @firestore_async.async_transactional
+    async def _delete(transaction):
+        snap = await ref.get(transaction=transaction)
+        if snap.exists:
+            transaction.delete(ref)
+            unique_keys.release(transaction, BLOG_KEYS, id, snap.to_dict() or {})
+
+    await _delete(adb().transaction())
+    blog_slugs.remove(id)
+    blog_cache.invalidate(id)
+    invalidate("blogs")
     return {"message": "Blog deleted"}
 
 @router.patch("/{id}/status")
-def toggle_blog_status(id: str, payload: dict, user=Depends(require_roles("admin"))):
+async def toggle_blog_status(id: str, payload: dict, user=Depends(require_roles("admin"))):
     status_ = payload.get("status")
     if not status_:
         raise HTTPException(400, detail="status required")
-    db().collection("blogs").document(id).set({"status": status_, "updated_at": now_iso()}, merge=True)
+    await adb().collection("blogs").document(id).set({"status": status_, "updated_at": now_iso()}, merge=True)
+    blog_cache.invalidate(id)
+    invalidate("blogs")
     return {"message": "Blog status updated", "status": status_}
@@ -1,79 +1,101 @@
 from fastapi import APIRouter, Depends, HTTPException
-from app.core.firebase import db
-from app.core.utils import gen_uuid, now_iso
 from app.core.deps import get_current_user
+from app.catalog.product_cache import product_cache
+from app.catalog.replica import replica
+from app.services import cart_store
 
 router = APIRouter()
 
+# product fields a cart line needs
+CART_PRODUCT_FIELDS = ("id", "name", "slug", "seller_id", "price", "original_price", "unit", "images",
+                       "stock_quantity", "min_order_quantity", "max_order_quantity", "is_active")
+
 @router.get("/{userId}")
-def get_cart(userId: str, user=Depends(get_current_user)):
+async def get_cart(userId: str, hydrate: bool = False, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
-    docs = db().collection("cart_items").where("user_id", "==", userId).stream()
-    return {"items": [d.to_dict() for d in docs]}
+    items = await cart_store.store.list(userId)
+    if not hydrate:
+        return {"items": items}
+    return await _hydrate(items)
+
+async def _hydrate(items: list[dict]) -> dict:
+    # every referenced product in one lookup: replica, else product cache + one get_all for the misses
+    ids = list(dict.fromkeys(it.get("product_id") for it in items if it.get("product_id")))
+    if replica.ready:
+        products = {p["id"]: p for p in replica.get_many(ids)}
+    else:
+        products = await product_cache.get_many(ids)
+
+    lines = []
+    subtotal = 0.0
+    quantity = 0
+    unavailable = 0
+    for it in items:
+        p = products.get(it.get("product_id"))
+        qty = int(it.get("quantity") or 0)
+        line = {**it, "product": None, "unit_price": None, "line_total": 0.0, "in_stock": False, "available": False}
+        if p is not None:
+            price = float(p.get("price") or 0)
+            stock = int(p.get("stock_quantity") or 0)
+            line["product"] = {f: p.get(f) for f in CART_PRODUCT_FIELDS}
+            line["unit_price"] = price
+            line["line_total"] = round(price * qty, 2)
+            line["in_stock"] = stock > 0
+            line["available"] = p.get("is_active") is True and stock >= qty
+        if line["available"]:
+            subtotal += line["line_total"]
+            quantity += qty
+        else:
+            unavailable += 1
+        lines.append(line)
+
+    return {
+        "items": lines,
+        "totals": {
+            "subtotal": round(subtotal, 2),
+            "item_count": quantity,
+            "unavailable_count": unavailable,
+        },
+    }
 
 @router.post("/{userId}/items")
-def add_to_cart(userId: str, payload: dict, user=Depends(get_current_user)):
+async def add_to_cart(userId: str, payload: dict, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
-    t = now_iso()
-    cid = gen_uuid()
-
-    doc = {
-        "id": cid,
-        "user_id": userId,
-        "product_id": payload.get("product_id"),
-        "product_variant_id": payload.get("product_variant_id"),
-        "quantity": int(payload.get("quantity", 1)),
-        "created_at": t,
-        "updated_at": t
-    }
-    if not doc["product_id"]:
+    product_id = payload.get("product_id")
+    if not product_id:
         raise HTTPException(400, detail="product_id required")
+    quantity = int(payload.get("quantity", 1))
+    if quantity < 1:
+        raise HTTPException(400, detail="quantity must be >= 1")
 
-    db().collection("cart_items").document(cid).set(doc)
+    cid = await cart_store.store.add(userId, product_id, payload.get("product_variant_id"), quantity)
     return {"message": "Added to cart", "id": cid}
 
 @router.put("/{userId}/items/{itemId}")
-def update_cart_item(userId: str, itemId: str, payload: dict, user=Depends(get_current_user)):
+async def update_cart_item(userId: str, itemId: str, payload: dict, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
-    doc = db().collection("cart_items").document(itemId).get()
-    if not doc.exists:
-        raise HTTPException(404, detail="Cart item not found")
-
-    data = doc.to_dict() or {}
-    if data.get("user_id") != userId:
-        raise HTTPException(403, detail="Forbidden")
-
-    upd = {
-        "quantity": int(payload.get("quantity", data.get("quantity", 1))),
-        "updated_at": now_iso()
-    }
-    db().collection("cart_items").document(itemId).set(upd, merge=True)
+    quantity = int(payload["quantity"]) if payload.get("quantity") is not None else None
+    await cart_store.store.set_quantity(userId, itemId, quantity)
     return {"message": "Cart item updated"}
 
 @router.delete("/{userId}/items/{itemId}")
-def remove_cart_item(userId: str, itemId: str, user=Depends(get_current_user)):
+async def remove_cart_item(userId: str, itemId: str, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
-    doc = db().collection("cart_items").document(itemId).get()
-    if doc.exists and (doc.to_dict() or {}).get("user_id") != userId:
-        raise HTTPException(403, detail="Forbidden")
-
-    db().collection("cart_items").document(itemId).delete()
+    await cart_store.store.remove(userId, itemId)
     return {"message": "Removed from cart"}
 
 @router.delete("/{userId}")
-def clear_cart(userId: str, user=Depends(get_current_user)):
+async def clear_cart(userId: str, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
-    docs = db().collection("cart_items").where("user_id", "==", userId).stream()
-    for d in docs:
-        db().collection("cart_items").document(d.id).delete()
+    await cart_store.store.clear(userId)
     return {"message": "Cart cleared"}
@@ -1,20 +1,32 @@
-from fastapi import APIRouter, Depends
-from app.core.firebase import db
+from fastapi import APIRouter, Depends, Request
+from app.core.firebase import adb
 from app.core.utils import gen_uuid, now_iso
 from app.core.deps import require_roles
+from app.utils.response_cache import cached, invalidate
 
 router = APIRouter()
 
-@router.get("/bsf")
-def get_bsf_education_content():
-    # return all active sections ordered by display_order (client sorts)
-    docs = db().collection("bsf_education").where("is_active", "==", True).stream()
-    items = [d.to_dict() for d in docs]
+# section cards (homepage): no body content
+SUMMARY_FIELDS = ("id", "section", "title", "images", "video_url", "display_order", "updated_at")
+
+async def active_sections(fields: list[str] | None = None) -> list[dict]:
+    # all active sections ordered by display_order
+    q = adb().collection("bsf_education").where("is_active", "==", True)
+    if fields is not None:
+        q = q.select(list(fields))
+    items = [d.to_dict() for d in await q.get()]
     items.sort(key=lambda x: int(x.get("display_order", 0)))
-    return {"items": items}
+    return items
+
+@router.get("/bsf")
+async def get_bsf_education_content(request: Request):
+    async def _load():
+        return {"items": await active_sections()}
+
+    return await cached(request, "bsf_education", {}, _load)
 
 @router.put("/bsf")
-def update_bsf_education_content(payload: dict, user=Depends(require_roles("admin"))):
+async def update_bsf_education_content(payload: dict, user=Depends(require_roles("admin"))):
     """
     You can update one section by providing id, or create new if no id
     """
@@ -33,5 +45,6 @@ def update_bsf_education_content(payload: dict, user=Depends(require_roles("admi
         "created_at": payload.get("created_at") or t,
         "updated_at": t
     }
-    db().collection("bsf_education").document(eid).set(doc, merge=True)
+    await adb().collection("bsf_education").document(eid).set(doc, merge=True)
+    invalidate("bsf_education")
     return {"message": "BSF education updated", "id": eid}
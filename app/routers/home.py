@@ -0,0 +1,46 @@
+import asyncio
+from fastapi import APIRouter, Request
+from app.catalog.records import SUMMARY_FIELDS as PRODUCT_FIELDS
+from app.routers import blogs, education, products, site_content
+from app.utils.conditional import render, respond
+from app.utils.response_cache import public_cache
+
+router = APIRouter()
+
+FEATURED_LIMIT = 12
+BLOG_LIMIT = 3
+
+# Everything the storefront's first screen needs, in one response. The parts
+# are loaded concurrently and cached separately in the public response cache,
+# each under the group its own listing uses, so a product, blog, BSF or site
+# content write only reloads that part. The assembled body is re-rendered only
+# when a part changed.
+
+async def _featured():
+    return await products.featured_products(FEATURED_LIMIT, list(PRODUCT_FIELDS))
+
+async def _blogs():
+    return (await blogs.published_page(BLOG_LIMIT, None, list(blogs.SUMMARY_FIELDS)))["items"]
+
+async def _bsf():
+    return await education.active_sections(list(education.SUMMARY_FIELDS))
+
+# part -> (response cache group, loader)
+PARTS = {
+    "site_content": ("site_content", site_content.all_sections),
+    "featured_products": ("products", _featured),
+    "blogs": ("blogs", _blogs),
+    "bsf_education": ("bsf_education", _bsf),
+}
+
+_rendered: tuple | None = None    # (parts, body, etag)
+
+@router.get("")
+async def get_home(request: Request):
+    global _rendered
+    values = await asyncio.gather(*(public_cache.get((group, (("home", name),)), load)
+                                    for name, (group, load) in PARTS.items()))
+    last = _rendered
+    if last is None or any(a is not b for a, b in zip(last[0], values)):
+        last = _rendered = (values, *render(dict(zip(PARTS, values))))
+    return respond(request, last[1], last[2])
@@ -1,10 +1,23 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, Query
-from app.core.firebase import db
+from firebase_admin import firestore_async
+from app.core.config import settings
+from app.core.firebase import adb
 from app.core.utils import gen_uuid, now_iso
 from app.core.deps import get_current_user, require_roles, require_seller_approved
+from app.services import seller_stats
+from app.utils.firestore_helpers import paginate, parse_fields, DESC
 
 router = APIRouter()
 
+# list pages (newest first)
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+ADMIN_MAX_PAGE_SIZE = 200
+# order history rows; the address, notes and contact details are on the detail endpoint
+SUMMARY_FIELDS = ("id", "order_number", "user_id", "seller_id", "status", "payment_status", "payment_method",
+                  "subtotal", "total_amount", "estimated_delivery_date", "tracking_number", "created_at", "updated_at")
+
 def _make_order_number():
     # simple format: ORD-YYYY-<short>
     from datetime import datetime
@@ -12,14 +25,21 @@ def _make_order_number():
     short = gen_uuid().split("-")[0].upper()
     return f"ORD-{y}-{short}"
 
+# one WriteBatch holds the order, its items, tracking and transaction rows
+MAX_ORDER_ITEMS = 450
+
 @router.post("")
-def create_order(payload: dict, user=Depends(get_current_user)):
+async def create_order(payload: dict, user=Depends(get_current_user)):
     """
-    Creates:
+    Creates (single batch, all or nothing):
     - orders/{id}
     - order_items/{id} (multiple)
     - order_tracking/{id} initial
     - transactions/{id} optional (if online)
+    Prices come from the product documents; delivery fee and tax from the
+    pricing settings. Client-sent delivery_fee/tax_amount are ignored and
+    discounts are rejected (there is nothing to back them yet). Orders always
+    start pending; status/payment_status in the payload are ignored.
     """
     t = now_iso()
     oid = gen_uuid()
@@ -32,20 +52,66 @@ def create_order(payload: dict, user=Depends(get_current_user)):
     items = payload.get("items", [])
     if not items:
         raise HTTPException(400, detail="items required")
+    if len(items) > MAX_ORDER_ITEMS:
+        raise HTTPException(400, detail=f"At most {MAX_ORDER_ITEMS} items per order")
+    for it in items:
+        if not it.get("product_id"):
+            raise HTTPException(400, detail="Each item needs product_id")
+        if int(it.get("quantity", 1)) < 1:
+            raise HTTPException(400, detail="quantity must be >= 1")
+    if float(payload.get("discount_amount") or 0) != 0:
+        raise HTTPException(400, detail="discount_amount is not accepted")
+
+    # Snapshot data: every referenced product in one round trip
+    refs = [adb().collection("products").document(pid) for pid in dict.fromkeys(it["product_id"] for it in items)]
+    products = {s.id: s.to_dict() async for s in adb().get_all(refs) if s.exists}
+
+    item_docs = []
+    for it in items:
+        prod_id = it["product_id"]
+        pdata = products.get(prod_id)
+        if pdata is None:
+            raise HTTPException(400, detail=f"Product not found: {prod_id}")
+        if pdata.get("seller_id") != seller_id:
+            raise HTTPException(400, detail=f"Product {prod_id} belongs to another seller")
+        if pdata.get("is_active") is not True:
+            raise HTTPException(400, detail=f"Product not available: {prod_id}")
+
+        qty = int(it.get("quantity", 1))
+        unit_price = float(pdata.get("price") or 0)
+        item_docs.append({
+            "id": gen_uuid(),
+            "order_id": oid,
+            "product_id": prod_id,
+            "product_variant_id": it.get("product_variant_id"),
+            "product_name": pdata.get("name") or it.get("product_name"),
+            "product_image": (pdata.get("images") or [None])[0] or it.get("product_image"),
+            "quantity": qty,
+            "unit_price": unit_price,
+            "total_price": round(unit_price * qty, 2),
+            "created_at": t
+        })
+
+    subtotal = round(sum(x["total_price"] for x in item_docs), 2)
+    free_above = settings.FREE_DELIVERY_MIN_SUBTOTAL
+    delivery_fee = 0.0 if free_above is not None and subtotal >= free_above else float(settings.DELIVERY_FEE)
+    tax_amount = round(subtotal * settings.TAX_RATE, 2)
+    discount_amount = 0.0
+    total_amount = round(subtotal + delivery_fee + tax_amount, 2)
 
     order_doc = {
         "id": oid,
         "order_number": order_number,
         "user_id": user["uid"],
         "seller_id": seller_id,
-        "status": payload.get("status", "pending"),
-        "payment_status": payload.get("payment_status", "pending"),
+        "status": "pending",
+        "payment_status": "pending",
         "payment_method": payload.get("payment_method", "cod"),
-        "subtotal": payload.get("subtotal", 0),
-        "delivery_fee": payload.get("delivery_fee", 0),
-        "tax_amount": payload.get("tax_amount", 0),
-        "discount_amount": payload.get("discount_amount", 0),
-        "total_amount": payload.get("total_amount", 0),
+        "subtotal": subtotal,
+        "delivery_fee": delivery_fee,
+        "tax_amount": tax_amount,
+        "discount_amount": discount_amount,
+        "total_amount": total_amount,
         "delivery_address": payload.get("delivery_address", {}),
         "customer_phone": payload.get("customer_phone"),
         "customer_email": payload.get("customer_email") or user.get("email"),
@@ -58,36 +124,17 @@ def create_order(payload: dict, user=Depends(get_current_user)):
         "created_at": t,
         "updated_at": t
     }
-    db().collection("orders").document(oid).set(order_doc)
-
-    # order_items
-    for it in items:
-        item_id = gen_uuid()
-        prod_id = it.get("product_id")
-        if not prod_id:
-            raise HTTPException(400, detail="Each item needs product_id")
 
-        # Snapshot data
-        prod_doc = db().collection("products").document(prod_id).get()
-        pdata = prod_doc.to_dict() if prod_doc.exists else {}
+    batch = adb().batch()
+    batch.set(adb().collection("orders").document(oid), order_doc)
 
-        item_doc = {
-            "id": item_id,
-            "order_id": oid,
-            "product_id": prod_id,
-            "product_variant_id": it.get("product_variant_id"),
-            "product_name": it.get("product_name") or pdata.get("name"),
-            "product_image": it.get("product_image") or (pdata.get("images") or [None])[0],
-            "quantity": int(it.get("quantity", 1)),
-            "unit_price": float(it.get("unit_price", pdata.get("price", 0))),
-            "total_price": float(it.get("total_price", 0)),
-            "created_at": t
-        }
-        db().collection("order_items").document(item_id).set(item_doc)
+    # order_items
+    for item_doc in item_docs:
+        batch.set(adb().collection("order_items").document(item_doc["id"]), item_doc)
 
     # order_tracking initial
     track_id = gen_uuid()
-    db().collection("order_tracking").document(track_id).set({
+    batch.set(adb().collection("order_tracking").document(track_id), {
         "id": track_id,
         "order_id": oid,
         "status": order_doc["status"],
@@ -100,7 +147,7 @@ def create_order(payload: dict, user=Depends(get_current_user)):
     # optional transaction create
     if order_doc["payment_method"] in ["online", "upi"]:
         txid = gen_uuid()
-        db().collection("transactions").document(txid).set({
+        batch.set(adb().collection("transactions").document(txid), {
             "id": txid,
             "order_id": oid,
             "user_id": user["uid"],
@@ -113,61 +160,93 @@ def create_order(payload: dict, user=Depends(get_current_user)):
             "updated_at": t
         })
 
-    return {"message": "Order created", "id": oid, "order_number": order_number}
+    seller_stats.apply(batch, seller_id, seller_stats.order_created(order_doc))
+
+    await batch.commit()
+    return {"message": "Order created", "id": oid, "order_number": order_number, "total_amount": total_amount}
 
 @router.get("/user/{userId}")
-def get_user_orders(userId: str, user=Depends(get_current_user)):
+async def get_user_orders(
+    userId: str,
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+    user=Depends(get_current_user)
+):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
-    docs = db().collection("orders").where("user_id", "==", userId).stream()
-    return {"items": [d.to_dict() for d in docs]}
+    q = adb().collection("orders").where("user_id", "==", userId)
+    return await paginate(q, [("created_at", DESC)], limit, cursor, parse_fields(fields, SUMMARY_FIELDS))
 
 @router.get("/seller/{sellerId}")
-def get_seller_orders(sellerId: str, user=Depends(require_seller_approved)):
+async def get_seller_orders(
+    sellerId: str,
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+    user=Depends(require_seller_approved)
+):
     if user["role"] == "seller" and user["uid"] != sellerId:
         raise HTTPException(403, detail="Forbidden")
-    docs = db().collection("orders").where("seller_id", "==", sellerId).stream()
-    return {"items": [d.to_dict() for d in docs]}
+    q = adb().collection("orders").where("seller_id", "==", sellerId)
+    return await paginate(q, [("created_at", DESC)], limit, cursor, parse_fields(fields, SUMMARY_FIELDS))
 
 @router.get("")
-def get_all_orders(user=Depends(require_roles("admin"))):
-    docs = db().collection("orders").stream()
-    return {"items": [d.to_dict() for d in docs]}
+async def get_all_orders(
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=ADMIN_MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None,
+    user=Depends(require_roles("admin"))
+):
+    return await paginate(adb().collection("orders"), [("created_at", DESC)], limit, cursor,
+                          parse_fields(fields, SUMMARY_FIELDS))
 
 @router.patch("/{id}/status")
-def update_order_status(id: str, payload: dict, user=Depends(require_seller_approved)):
-    odoc = db().collection("orders").document(id).get()
-    if not odoc.exists:
-        raise HTTPException(404, detail="Order not found")
-    o = odoc.to_dict() or {}
-
-    # seller can update only their orders
-    if user["role"] == "seller" and o.get("seller_id") != user["uid"]:
-        raise HTTPException(403, detail="Forbidden")
-
+async def update_order_status(id: str, payload: dict, user=Depends(require_seller_approved)):
     status_ = payload.get("status")
     if not status_:
         raise HTTPException(400, detail="status required")
 
     t = now_iso()
-    db().collection("orders").document(id).set({"status": status_, "updated_at": t}, merge=True)
-
-    # track history row
+    ref = adb().collection("orders").document(id)
     tid = gen_uuid()
-    db().collection("order_tracking").document(tid).set({
-        "id": tid,
-        "order_id": id,
-        "status": status_,
-        "location": payload.get("location"),
-        "description": payload.get("description"),
-        "updated_by": user["uid"],
-        "created_at": t
-    })
+
+    # read + status write + seller_stats counters in one transaction, so
+    # concurrent status changes can't double count
+    @firestore_async.async_transactional
+    async def _update(transaction):
+        odoc = await ref.get(transaction=transaction)
+        if not odoc.exists:
+            raise HTTPException(404, detail="Order not found")
+        o = odoc.to_dict() or {}
+
+        # seller can update only their orders
+        if user["role"] == "seller" and o.get("seller_id") != user["uid"]:
+            raise HTTPException(403, detail="Forbidden")
+
+        transaction.set(ref, {"status": status_, "updated_at": t}, merge=True)
+
+        # track history row
+        transaction.set(adb().collection("order_tracking").document(tid), {
+            "id": tid,
+            "order_id": id,
+            "status": status_,
+            "location": payload.get("location"),
+            "description": payload.get("description"),
+            "updated_by": user["uid"],
+            "created_at": t
+        })
+        seller_stats.apply(transaction, o.get("seller_id"), seller_stats.order_status_changed(o.get("status"), status_))
+
+    await _update(adb().transaction())
     return {"message": "Order status updated", "status": status_}
 
 @router.get("/track")
-def track_order(orderId: str = Query(...), phone: str = Query(...)):
-    odoc = db().collection("orders").document(orderId).get()
+async def track_order(orderId: str = Query(...), phone: str = Query(...)):
+    odoc, tracks = await asyncio.gather(
+        adb().collection("orders").document(orderId).get(),
+        adb().collection("order_tracking").where("order_id", "==", orderId).get(),
+    )
     if not odoc.exists:
         raise HTTPException(404, detail="Order not found")
     o = odoc.to_dict() or {}
@@ -176,13 +255,17 @@ def track_order(orderId: str = Query(...), phone: str = Query(...)):
         raise HTTPException(403, detail="Phone mismatch")
 
     # return current order + tracking history
-    tracks = db().collection("order_tracking").where("order_id", "==", orderId).stream()
     history = [t.to_dict() for t in tracks]
     return {"order": o, "tracking": history}
 
 @router.get("/{id}")
-def get_order_details(id: str, user=Depends(get_current_user)):
-    odoc = db().collection("orders").document(id).get()
+async def get_order_details(id: str, user=Depends(get_current_user)):
+    # independent reads; owner check runs before anything is returned
+    odoc, items, tracks = await asyncio.gather(
+        adb().collection("orders").document(id).get(),
+        adb().collection("order_items").where("order_id", "==", id).get(),
+        adb().collection("order_tracking").where("order_id", "==", id).get(),
+    )
     if not odoc.exists:
         raise HTTPException(404, detail="Order not found")
     o = odoc.to_dict() or {}
@@ -191,9 +274,7 @@ def get_order_details(id: str, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] not in [o.get("user_id"), o.get("seller_id")]:
         raise HTTPException(403, detail="Forbidden")
 
-    items = db().collection("order_items").where("order_id", "==", id).stream()
     item_list = [d.to_dict() for d in items]
-    tracks = db().collection("order_tracking").where("order_id", "==", id).stream()
     history = [d.to_dict() for d in tracks]
 
     return {"order": o, "items": item_list, "tracking": history}
@@ -1,19 +1,20 @@
 from fastapi import APIRouter, Depends, HTTPException
-from app.core.firebase import db
+from app.core.firebase import adb
 from app.core.utils import gen_uuid, now_iso
 from app.core.deps import get_current_user
+from app.utils.firestore_helpers import BulkWriter
 
 router = APIRouter()
 
 @router.get("/{userId}")
-def get_payment_methods(userId: str, user=Depends(get_current_user)):
+async def get_payment_methods(userId: str, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
-    docs = db().collection("payment_methods").where("user_id", "==", userId).stream()
+    docs = await adb().collection("payment_methods").where("user_id", "==", userId).get()
     return {"items": [d.to_dict() for d in docs]}
 
 @router.post("/{userId}")
-def add_payment_method(userId: str, payload: dict, user=Depends(get_current_user)):
+async def add_payment_method(userId: str, payload: dict, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
@@ -36,21 +37,24 @@ def add_payment_method(userId: str, payload: dict, user=Depends(get_current_user
 
     # if default => unset others
     if doc["is_default"]:
-        others = db().collection("payment_methods").where("user_id", "==", userId).where("is_default", "==", True).stream()
+        others = await adb().collection("payment_methods").where("user_id", "==", userId).where("is_default", "==", True).select([]).get()
+        writer = BulkWriter()
         for o in others:
-            db().collection("payment_methods").document(o.id).set({"is_default": False, "updated_at": t}, merge=True)
-
-    db().collection("payment_methods").document(pid).set(doc)
+            writer.set(o.reference, {"is_default": False, "updated_at": t}, merge=True)
+        writer.set(adb().collection("payment_methods").document(pid), doc)
+        await writer.commit()
+    else:
+        await adb().collection("payment_methods").document(pid).set(doc)
     return {"message": "Payment method added", "id": pid}
 
 @router.delete("/{userId}/{methodId}")
-def delete_payment_method(userId: str, methodId: str, user=Depends(get_current_user)):
+async def delete_payment_method(userId: str, methodId: str, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
-    doc = db().collection("payment_methods").document(methodId).get()
+    doc = await adb().collection("payment_methods").document(methodId).get()
     if doc.exists and (doc.to_dict() or {}).get("user_id") != userId:
         raise HTTPException(403, detail="Forbidden")
 
-    db().collection("payment_methods").document(methodId).delete()
+    await adb().collection("payment_methods").document(methodId).delete()
     return {"message": "Payment method deleted"}
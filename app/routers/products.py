@@ -1,27 +1,137 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from app.core.firebase import db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from firebase_admin import firestore_async
+from google.api_core.exceptions import AlreadyExists
+from app.core.firebase import adb
 from app.core.utils import gen_uuid, now_iso
 from app.core.deps import require_roles, require_seller_approved, get_current_user
+from app.catalog import sync as catalog_sync
+from app.search.index import product_index, filter_meta, meta_filter
+from app.search.suggest import suggest_index
+from app.search.trigram import trigram_index
+from app.catalog.topk import topk_index
+from app.catalog.product_cache import product_cache
+from app.catalog.replica import replica, serves, fetch, cursor_after
+from app.catalog.columnar import columnar_index
+from app.catalog.records import SUMMARY_FIELDS
+from app.services import seller_stats, unique_keys
+from app.services.unique_keys import PRODUCT_KEYS
+from app.services.slugs import product_slugs
+from app.utils.firestore_helpers import paginate, parse_fields, encode_cursor, decode_cursor, ASC, DESC
+from app.utils.conditional import conditional
+from app.utils.response_cache import cached
 
 router = APIRouter()
 
-def _ensure_unique(collection: str, field: str, value: str, exclude_id: str | None = None):
-    q = db().collection(collection).where(field, "==", value).limit(1).stream()
-    for doc in q:
-        if exclude_id and doc.id == exclude_id:
-            continue
-        raise HTTPException(409, detail=f"{field} must be unique")
+PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+
+SORTS = {
+    "price": ("price", ASC),
+    "-price": ("price", DESC),
+    "rating": ("rating", DESC),
+    "total_sold": ("total_sold", DESC),
+    "newest": ("created_at", DESC),
+}
+# equality-filter combinations with a composite index on (filters..., sort field, __name__)
+# for every sort above (firestore.indexes.json); other combinations, with or
+# without sort=, are sorted from the in-memory catalog
+INDEXED_FILTERS = (frozenset(), frozenset({"is_active"}), frozenset({"is_active", "category"}))
 
 @router.get("")
-def get_all_products(
+async def get_all_products(
+    request: Request,
     category: str | None = None,
     subcategory: str | None = None,
     search: str | None = None,
     min_price: float | None = Query(default=None, alias="minPrice"),
     max_price: float | None = Query(default=None, alias="maxPrice"),
-    is_active: bool | None = Query(default=True, alias="isActive")
+    is_active: bool | None = Query(default=True, alias="isActive"),
+    fuzzy: bool | None = None,
+    sort: str | None = None,
+    facets: bool = False,
+    fields: str | None = None,
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None
 ):
-    ref = db().collection("products")
+    # list-view fields by default; fields=a,b,c or fields=all to choose
+    projection = parse_fields(fields, SUMMARY_FIELDS)
+
+    async def _load():
+        page = await _list_products(category, subcategory, search, min_price, max_price, is_active,
+                                    fuzzy, sort, limit, cursor, projection)
+        if facets:
+            # sidebar counts for the same filters (and search), from the in-memory columnar index
+            within = None
+            if search and search.strip():
+                within = _search_ids(search, fuzzy, meta_filter(is_active, category, subcategory, min_price,
+                                                                max_price))
+            page["facets"] = columnar_index.query({
+                "category": category or None, "subcategory": subcategory or None,
+                "min_price": min_price, "max_price": max_price, "is_active": is_active,
+            }, facets=True, ids=False, within=within)["facets"]
+        return page
+
+    # "" and None filter the same
+    params = {"category": category or None, "subcategory": subcategory or None,
+              "search": search.strip() if search and search.strip() else None, "min_price": min_price,
+              "max_price": max_price, "is_active": is_active, "fuzzy": fuzzy, "sort": sort, "facets": facets,
+              "fields": tuple(projection) if projection is not None else None, "limit": limit, "cursor": cursor}
+    return await cached(request, "products", params, _load)
+
+@router.get("/facets")
+async def product_facets(
+    category: str | None = None,
+    subcategory: str | None = None,
+    origin: str | None = None,
+    seller_id: str | None = Query(default=None, alias="sellerId"),
+    min_price: float | None = Query(default=None, alias="minPrice"),
+    max_price: float | None = Query(default=None, alias="maxPrice"),
+    is_active: bool | None = Query(default=True, alias="isActive"),
+    is_organic: bool | None = Query(default=None, alias="isOrganic"),
+):
+    res = columnar_index.query({
+        "category": category or None, "subcategory": subcategory or None,
+        "origin": origin or None, "seller_id": seller_id or None,
+        "min_price": min_price, "max_price": max_price,
+        "is_active": is_active, "is_organic": is_organic,
+    }, facets=True, ids=False)
+    return {"total": res["total"], "facets": res["facets"]}
+
+async def _list_products(category, subcategory, search, min_price, max_price, is_active, fuzzy, sort, limit, cursor,
+                         fields):
+    if sort is not None and sort not in SORTS:
+        raise HTTPException(400, detail=f"sort must be one of: {', '.join(SORTS)}")
+    if search and search.strip():
+        return await _search_products(search, category, subcategory, min_price, max_price, is_active,
+                                      fuzzy, sort, limit, cursor, fields)
+
+    equality = {"is_active": None if is_active is None else bool(is_active),
+                "category": category or None, "subcategory": subcategory or None}
+    equality = {k: v for k, v in equality.items() if v is not None}
+    has_range = min_price is not None or max_price is not None
+    if sort:
+        field, direction = SORTS[sort]
+    elif has_range:
+        field, direction = "price", ASC
+    else:
+        field, direction = "created_at", DESC
+    if cursor:
+        # 400 for a cursor of another listing or with a mistyped value, on every path
+        cursor_after(cursor, field)
+
+    matches = meta_filter(is_active, category, subcategory, min_price, max_price)
+    if replica.ready:
+        # live in-memory copy: any filter/sort combination, no Firestore reads
+        return await replica.paginate_full(lambda d: matches(filter_meta(d)), field, direction == DESC, limit,
+                                           cursor, fields)
+
+    # no composite index for this combination, or Firestore would need the
+    # range field as the first sort key
+    if frozenset(equality) not in INDEXED_FILTERS or (has_range and field != "price"):
+        memo_key = (tuple(sorted(equality.items())), min_price, max_price)
+        return await _sorted_from_catalog(matches, memo_key, field, direction, limit, cursor, fields)
+
+    ref = adb().collection("products")
 
     # Basic filters (Firestore composite indexes may be required)
     if is_active is not None:
@@ -35,33 +145,100 @@ def get_all_products(
     if max_price is not None:
         ref = ref.where("price", "<=", float(max_price))
 
-    items = [d.to_dict() for d in ref.stream()]
+    # without sort= a price range is listed by price (the range field must be
+    # the first sort key), everything else newest first
+    return await paginate(ref, [(field, direction)], limit, cursor, fields)
+
+async def featured_products(limit: int, fields: list[str] | None = None) -> list[dict]:
+    # active + featured, newest first
+    if replica.ready:
+        page = await replica.paginate_full(lambda d: d.get("is_featured") is True and d.get("is_active") is True,
+                                           "created_at", True, limit, None, fields)
+    else:
+        q = adb().collection("products").where("is_active", "==", True).where("is_featured", "==", True)
+        page = await paginate(q, [("created_at", DESC)], limit, None, fields)
+    return page["items"]
 
-    if search:
-        s = search.lower().strip()
-        items = [x for x in items if s in (x.get("name","").lower() + " " + (x.get("description","") or "").lower())]
+async def _get_products(ids: list[str], fields: list[str] | None = None) -> list[dict]:
+    if replica.ready and serves(fields):
+        return replica.get_many(ids, fields)
+    return await fetch(ids, fields)
 
-    return {"items": items}
+async def _sorted_from_catalog(matches, memo_key, field, direction, limit, cursor, fields):
+    # heap top-K over the in-memory catalog; cursors have the same shape as paginate()'s
+    after = cursor_after(cursor, field) if cursor else None
+
+    rows = topk_index.top(field, direction == DESC, limit + 1, after, predicate=matches, memo_key=memo_key)
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        pid, value = page[-1]
+        next_cursor = encode_cursor({field: value, "__name__": pid})
+    return {"items": await _get_products([pid for pid, _ in page], fields), "next_cursor": next_cursor}
+
+async def _search_products(search, category, subcategory, min_price, max_price, is_active, fuzzy, sort, limit,
+                           cursor, fields):
+    # ranked ids from the in-memory index; only the requested page is read from Firestore
+    matches = meta_filter(is_active, category, subcategory, min_price, max_price)
+    hits = product_index.search(search, predicate=matches)
+    if _use_fuzzy(fuzzy, hits):
+        seen = {pid for pid, _ in hits}
+        hits += [h for h in trigram_index.search(search, predicate=matches) if h[0] not in seen]
+    if sort:
+        # sort= orders the matches instead of the relevance ranking
+        field, direction = SORTS[sort]
+        hits = [(pid, None) for pid in topk_index.order([pid for pid, _ in hits], field, direction == DESC)]
+    # ranking is not a stored sort key, so the search cursor is a position in the results
+    offset = 0
+    if cursor:
+        offset = decode_cursor(cursor).get("offset")
+        if not isinstance(offset, int) or offset < 0:
+            raise HTTPException(400, detail="Invalid cursor")
+    page = hits[offset:offset + limit]
+    items = await _get_products([pid for pid, _ in page], fields)
+    next_cursor = encode_cursor({"offset": offset + limit}) if offset + limit < len(hits) else None
+    return {"items": items, "next_cursor": next_cursor, "total": len(hits)}
+
+def _use_fuzzy(fuzzy, exact_hits) -> bool:
+    # fuzzy: None = only when nothing matched exactly, True = append typo matches, False = off
+    return bool(fuzzy) or (fuzzy is None and not exact_hits)
+
+def _search_ids(search, fuzzy, matches) -> set[str]:
+    # every product the search finds whatever the filters (each facet drops its
+    # own filter), with typo matches exactly when the results include them
+    ids = {pid for pid, _ in product_index.search(search)}
+    if _use_fuzzy(fuzzy, ids and product_index.search(search, predicate=matches)):
+        ids.update(pid for pid, _ in trigram_index.search(search))
+    return ids
+
+@router.get("/suggest")
+async def suggest_products(q: str = Query(..., min_length=1), limit: int = Query(default=8, ge=1, le=20)):
+    # typeahead: in-memory only, never touches Firestore
+    return {"items": suggest_index.suggest(q, limit)}
+
+@router.get("/by-slug/{slug}")
+async def get_product_by_slug(slug: str, request: Request):
+    # slug -> id from memory, then the same cache as the id endpoint
+    doc = await product_slugs.lookup(slug, product_cache)
+    if doc is None:
+        raise HTTPException(404, detail="Product not found")
+    return conditional(request, doc)
 
 @router.get("/{id}")
-def get_product_by_id(id: str):
-    doc = db().collection("products").document(id).get()
-    if not doc.exists:
+async def get_product_by_id(id: str, request: Request):
+    # the full document (description, nutrition, SEO fields) comes from the
+    # bounded cache; not the replica, which may not have seen a new product yet
+    doc = await product_cache.get(id)
+    if doc is None:
         raise HTTPException(404, detail="Product not found")
-    return doc.to_dict()
+    return conditional(request, doc)
 
 @router.post("")
-def create_product(payload: dict, user=Depends(require_seller_approved)):
+async def create_product(payload: dict, user=Depends(require_seller_approved)):
     # seller/admin
     t = now_iso()
     pid = gen_uuid()
 
-    # uniqueness checks
-    if payload.get("slug"):
-        _ensure_unique("products", "slug", payload["slug"])
-    if payload.get("sku"):
-        _ensure_unique("products", "sku", payload["sku"])
-
     doc = {
         "id": pid,
         "seller_id": payload.get("seller_id") or user["uid"],
@@ -98,12 +275,22 @@ def create_product(payload: dict, user=Depends(require_seller_approved)):
         "updated_at": t
     }
 
-    db().collection("products").document(pid).set(doc)
+    await unique_keys.check(PRODUCT_KEYS, pid, doc)
+    batch = adb().batch()
+    # slug/SKU reservations: the whole batch fails if either is taken
+    unique_keys.claim(batch, PRODUCT_KEYS, pid, doc)
+    batch.set(adb().collection("products").document(pid), doc)
+    seller_stats.apply(batch, doc["seller_id"], seller_stats.product_created(doc))
+    try:
+        await batch.commit()
+    except AlreadyExists:
+        raise await unique_keys.conflict(PRODUCT_KEYS, pid, doc)
+    catalog_sync.product_saved(doc)
     return {"message": "Product created", "id": pid}
 
 @router.put("/{id}")
-def update_product(id: str, payload: dict, user=Depends(require_seller_approved)):
-    doc = db().collection("products").document(id).get()
+async def update_product(id: str, payload: dict, user=Depends(require_seller_approved)):
+    doc = await adb().collection("products").document(id).get()
     if not doc.exists:
         raise HTTPException(404, detail="Product not found")
     data = doc.to_dict() or {}
@@ -112,25 +299,52 @@ def update_product(id: str, payload: dict, user=Depends(require_seller_approved)
     if user["role"] == "seller" and data.get("seller_id") != user["uid"]:
         raise HTTPException(403, detail="Forbidden")
 
-    # uniqueness checks on update
-    if payload.get("slug"):
-        _ensure_unique("products", "slug", payload["slug"], exclude_id=id)
-    if payload.get("sku"):
-        _ensure_unique("products", "sku", payload["sku"], exclude_id=id)
-
+    await unique_keys.check(PRODUCT_KEYS, id, payload)
     payload["updated_at"] = now_iso()
-    db().collection("products").document(id).set(payload, merge=True)
+    try:
+        data = await _update_product(adb().collection("products").document(id), payload)
+    except AlreadyExists:
+        raise await unique_keys.conflict(PRODUCT_KEYS, id, payload)
+    catalog_sync.product_saved({**data, **payload, "id": id})
     return {"message": "Product updated"}
 
+async def _update_product(ref, upd: dict) -> dict:
+    # write + slug/SKU reservations + active_products counter in one transaction;
+    # returns the previous data
+    @firestore_async.async_transactional
+    async def _update(transaction):
+        snap = await ref.get(transaction=transaction)
+        data = snap.to_dict() or {}
+        unique_keys.claim(transaction, PRODUCT_KEYS, ref.id, upd, data)
+        transaction.set(ref, upd, merge=True)
+        if "is_active" in upd:
+            delta = seller_stats.product_active_changed(data.get("is_active") is True, upd["is_active"] is True)
+            seller_stats.apply(transaction, data.get("seller_id"), delta)
+        return data
+
+    return await _update(adb().transaction())
+
 @router.delete("/{id}")
-def delete_product(id: str, user=Depends(require_roles("admin"))):
+async def delete_product(id: str, user=Depends(require_roles("admin"))):
     # admin only
-    db().collection("products").document(id).delete()
+    ref = adb().collection("products").document(id)
+
+    @firestore_async.async_transactional
+    async def _delete(transaction):
+        snap = await ref.get(transaction=transaction)
+        if snap.exists:
+            data = snap.to_dict() or {}
+            transaction.delete(ref)
+            unique_keys.release(transaction, PRODUCT_KEYS, id, data)
+            seller_stats.apply(transaction, data.get("seller_id"), seller_stats.product_deleted(data))
+
+    await _delete(adb().transaction())
+    catalog_sync.product_deleted(id)
     return {"message": "Product deleted"}
 
 @router.patch("/{id}/status")
-def toggle_product_status(id: str, payload: dict, user=Depends(require_seller_approved)):
-    doc = db().collection("products").document(id).get()
+async def toggle_product_status(id: str, payload: dict, user=Depends(require_seller_approved)):
+    doc = await adb().collection("products").document(id).get()
     if not doc.exists:
         raise HTTPException(404, detail="Product not found")
     data = doc.to_dict() or {}
@@ -138,5 +352,7 @@ def toggle_product_status(id: str, payload: dict, user=Depends(require_seller_ap
         raise HTTPException(403, detail="Forbidden")
 
     is_active = bool(payload.get("is_active", payload.get("status", True)))
-    db().collection("products").document(id).set({"is_active": is_active, "updated_at": now_iso()}, merge=True)
+    upd = {"is_active": is_active, "updated_at": now_iso()}
+    data = await _update_product(doc.reference, upd)
+    catalog_sync.product_saved({**data, **upd})
     return {"message": "Product status updated", "is_active": is_active}
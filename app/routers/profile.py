@@ -1,17 +1,22 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException
-from app.core.firebase import db
+from app.core.firebase import adb
 from app.core.utils import gen_uuid, now_iso
 from app.core.deps import get_current_user
+from app.core.claims import sync_user_claims
+from app.utils.firestore_helpers import BulkWriter
 
 router = APIRouter()
 
 @router.get("/{userId}")
-def get_profile(userId: str, user=Depends(get_current_user)):
+async def get_profile(userId: str, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
-    u = db().collection("users").document(userId).get()
-    p = db().collection("user_profiles").document(userId).get()
+    u, p = await asyncio.gather(
+        adb().collection("users").document(userId).get(),
+        adb().collection("user_profiles").document(userId).get(),
+    )
 
     if not u.exists:
         raise HTTPException(404, detail="User not found")
@@ -22,37 +27,39 @@ def get_profile(userId: str, user=Depends(get_current_user)):
     }
 
 @router.put("/{userId}")
-def update_profile(userId: str, payload: dict, user=Depends(get_current_user)):
+async def update_profile(userId: str, payload: dict, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
     t = now_iso()
     # update users (safe fields)
     if any(k in payload for k in ["full_name", "phone", "status"]):
-        db().collection("users").document(userId).set({
+        await adb().collection("users").document(userId).set({
             **{k: payload[k] for k in ["full_name","phone","status"] if k in payload},
             "updated_at": t
         }, merge=True)
+        if "status" in payload:
+            await sync_user_claims(userId, revoke=payload["status"] != "active", status=payload["status"])
 
     # update user_profiles
     prof_fields = ["avatar_url","date_of_birth","gender","bio","preferences"]
     prof_update = {k: payload[k] for k in prof_fields if k in payload}
     if prof_update:
         prof_update["updated_at"] = t
-        db().collection("user_profiles").document(userId).set(prof_update, merge=True)
+        await adb().collection("user_profiles").document(userId).set(prof_update, merge=True)
 
     return {"message": "Profile updated"}
 
 @router.get("/{userId}/addresses")
-def get_addresses(userId: str, user=Depends(get_current_user)):
+async def get_addresses(userId: str, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
-    docs = db().collection("delivery_addresses").where("user_id", "==", userId).stream()
+    docs = await adb().collection("delivery_addresses").where("user_id", "==", userId).get()
     return {"items": [d.to_dict() for d in docs]}
 
 @router.post("/{userId}/addresses")
-def add_or_update_address(userId: str, payload: dict, user=Depends(get_current_user)):
+async def add_or_update_address(userId: str, payload: dict, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
@@ -78,18 +85,21 @@ def add_or_update_address(userId: str, payload: dict, user=Depends(get_current_u
 
     # if is_default true -> unset other defaults
     if doc["is_default"]:
-        others = db().collection("delivery_addresses").where("user_id", "==", userId).where("is_default", "==", True).stream()
+        others = await adb().collection("delivery_addresses").where("user_id", "==", userId).where("is_default", "==", True).select([]).get()
+        writer = BulkWriter()
         for o in others:
             if o.id != addr_id:
-                db().collection("delivery_addresses").document(o.id).set({"is_default": False, "updated_at": t}, merge=True)
-
-    db().collection("delivery_addresses").document(addr_id).set(doc, merge=True)
+                writer.set(o.reference, {"is_default": False, "updated_at": t}, merge=True)
+        writer.set(adb().collection("delivery_addresses").document(addr_id), doc, merge=True)
+        await writer.commit()
+    else:
+        await adb().collection("delivery_addresses").document(addr_id).set(doc, merge=True)
     return {"message": "Address saved", "id": addr_id}
 
 @router.delete("/{userId}/addresses/{addressId}")
-def delete_address(userId: str, addressId: str, user=Depends(get_current_user)):
+async def delete_address(userId: str, addressId: str, user=Depends(get_current_user)):
     if user["role"] != "admin" and user["uid"] != userId:
         raise HTTPException(403, detail="Forbidden")
 
-    db().collection("delivery_addresses").document(addressId).delete()
+    await adb().collection("delivery_addresses").document(addressId).delete()
     return {"message": "Address deleted"}
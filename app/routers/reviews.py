@@ -1,17 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.core.firebase import db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from firebase_admin import firestore_async
+from app.core.firebase import adb
 from app.core.utils import gen_uuid, now_iso
 from app.core.deps import get_current_user
+from app.catalog import sync as catalog_sync
+from app.services import ratings, seller_stats
+from app.utils.firestore_helpers import paginate, DESC
+from app.utils.conditional import conditional
+from app.utils.response_cache import cached, invalidate
 
 router = APIRouter()
 
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 50
+
 @router.get("/product/{productId}")
-def get_product_reviews(productId: str):
-    docs = db().collection("reviews").where("product_id", "==", productId).stream()
-    return {"items": [d.to_dict() for d in docs]}
+async def get_product_reviews(
+    productId: str,
+    request: Request,
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    summary: bool = False
+):
+    q = adb().collection("reviews").where("product_id", "==", productId)
+    page = await paginate(q, [("created_at", DESC)], limit, cursor)
+    if summary:
+        page["summary"] = await ratings.summary(ratings.product_ref(productId))
+    return conditional(request, page)
 
 @router.post("")
-def create_review(payload: dict, user=Depends(get_current_user)):
+async def create_review(payload: dict, user=Depends(get_current_user)):
     """
     reviews fields:
     user_id, product_id?, seller_id?, order_id, rating, title, comment, images, is_verified_purchase, helpful_count
@@ -36,23 +54,66 @@ def create_review(payload: dict, user=Depends(get_current_user)):
     }
     if not doc["order_id"]:
         raise HTTPException(400, detail="order_id required")
+    if not 1 <= doc["rating"] <= 5:
+        raise HTTPException(400, detail="rating must be between 1 and 5")
+
+    review_ref = adb().collection("reviews").document(rid)
+    prod_ref = ratings.product_ref(doc["product_id"]) if doc["product_id"] else None
+
+    # review + product/seller rating aggregates + seller_stats in one transaction
+    @firestore_async.async_transactional
+    async def _create(transaction):
+        pdata = None
+        if prod_ref is not None:
+            prod = await prod_ref.get(transaction=transaction)
+            pdata = prod.to_dict() if prod.exists else None
+        if not doc["seller_id"] and pdata:
+            doc["seller_id"] = pdata.get("seller_id")
+        parents = []
+        if pdata is not None:
+            parents.append(prod_ref)
+        if doc["seller_id"]:
+            parents.append(ratings.seller_ref(doc["seller_id"]))
+        written = await ratings.record(transaction, parents, doc["rating"])
+        transaction.set(review_ref, doc)
+        seller_stats.apply(transaction, doc["seller_id"], seller_stats.review_created(doc["rating"]))
+        return pdata, parents, written
 
-    db().collection("reviews").document(rid).set(doc)
+    pdata, parents, written = await _create(adb().transaction())
+    ratings.note_reviews(parents)
 
-    # optional: update product review_count/rating (simple naive update)
-    if doc["product_id"]:
-        prod_ref = db().collection("products").document(doc["product_id"])
-        prod = prod_ref.get()
-        if prod.exists:
-            pdata = prod.to_dict() or {}
-            rc = int(pdata.get("review_count", 0)) + 1
-            old_rating = float(pdata.get("rating", 0))
-            new_rating = ((old_rating * (rc - 1)) + doc["rating"]) / rc if rc > 0 else doc["rating"]
-            prod_ref.set({"review_count": rc, "rating": new_rating, "updated_at": t}, merge=True)
+    def _product_refreshed(fields):
+        catalog_sync.product_saved({**pdata, **fields})
+
+    for parent in parents:
+        if parent.path not in written:
+            # sharded (hot) parent: summary is recomputed from the shards, throttled
+            on_refresh = _product_refreshed if parent == prod_ref else None
+            written[parent.path] = await ratings.refresh(parent, on_refresh=on_refresh)
+    if pdata is not None and written.get(prod_ref.path):
+        _product_refreshed(written[prod_ref.path])
+    invalidate("seller_reviews")
 
     return {"message": "Review created", "id": rid}
 
 @router.get("/seller/{sellerId}")
-def get_seller_reviews(sellerId: str):
-    docs = db().collection("reviews").where("seller_id", "==", sellerId).stream()
-    return {"items": [d.to_dict() for d in docs]}
+async def get_seller_reviews(
+    sellerId: str,
+    request: Request,
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    summary: bool = False
+):
+    return await seller_reviews_page(request, sellerId, limit, cursor, summary)
+
+async def seller_reviews_page(request: Request, seller_id: str, limit: int, cursor: str | None, summary: bool):
+    # also served as /api/sellers/{id}/reviews; both share one cache entry
+    async def _load():
+        q = adb().collection("reviews").where("seller_id", "==", seller_id)
+        page = await paginate(q, [("created_at", DESC)], limit, cursor)
+        if summary:
+            page["summary"] = await ratings.summary(ratings.seller_ref(seller_id))
+        return page
+
+    params = {"seller_id": seller_id, "limit": limit, "cursor": cursor, "summary": summary}
+    return await cached(request, "seller_reviews", params, _load)
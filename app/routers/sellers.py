@@ -1,19 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.core.firebase import db
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from app.core.firebase import adb
 from app.core.utils import now_iso
 from app.core.deps import get_current_user, require_roles, require_seller_approved
+from app.core.claims import sync_user_claims
+from app.catalog.replica import replica
+from app.catalog.records import SUMMARY_FIELDS
+from app.routers import reviews
+from app.services import seller_stats
+from app.utils.firestore_helpers import paginate, parse_fields, DESC
+from app.utils.conditional import conditional
+from app.utils.response_cache import cached
 
 router = APIRouter()
 
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
 @router.get("/{sellerId}")
-def get_seller_profile(sellerId: str):
-    s = db().collection("seller_profiles").document(sellerId).get()
+async def get_seller_profile(sellerId: str, request: Request):
+    s = await adb().collection("seller_profiles").document(sellerId).get()
     if not s.exists:
         raise HTTPException(404, detail="Seller profile not found")
-    return s.to_dict()
+    return conditional(request, s.to_dict())
 
 @router.put("/{sellerId}")
-def update_seller_profile(sellerId: str, payload: dict, user=Depends(get_current_user)):
+async def update_seller_profile(sellerId: str, payload: dict, user=Depends(get_current_user)):
     if user["role"] not in ["seller", "admin"]:
         raise HTTPException(403, detail="Forbidden")
     if user["role"] == "seller" and user["uid"] != sellerId:
@@ -26,63 +37,72 @@ def update_seller_profile(sellerId: str, payload: dict, user=Depends(get_current
         payload.pop("is_verified", None)
 
     payload["updated_at"] = now_iso()
-    db().collection("seller_profiles").document(sellerId).set(payload, merge=True)
+    await adb().collection("seller_profiles").document(sellerId).set(payload, merge=True)
+    if "approval_status" in payload:
+        approval = payload["approval_status"]
+        await sync_user_claims(sellerId, revoke=approval != "approved", approval_status=approval)
     return {"message": "Seller profile updated"}
 
 @router.get("/{sellerId}/stats")
-def get_seller_stats(sellerId: str, user=Depends(get_current_user)):
+async def get_seller_stats(sellerId: str, user=Depends(get_current_user)):
     # seller or admin; seller only their own
     if user["role"] not in ["seller", "admin"]:
         raise HTTPException(403, detail="Forbidden")
     if user["role"] == "seller" and user["uid"] != sellerId:
         raise HTTPException(403, detail="Forbidden")
 
-    # compute quickly (for large scale store seller_stats materialized)
-    products = list(db().collection("products").where("seller_id", "==", sellerId).stream())
-    active_products = [p for p in products if (p.to_dict() or {}).get("is_active") is True]
-    orders = list(db().collection("orders").where("seller_id", "==", sellerId).stream())
-    pending_orders = [o for o in orders if (o.to_dict() or {}).get("status") in ["pending","confirmed","packed","shipped"]]
-    completed_orders = [o for o in orders if (o.to_dict() or {}).get("status") == "delivered"]
-
-    revenue = 0.0
-    for o in orders:
-        revenue += float((o.to_dict() or {}).get("total_amount") or 0)
-
-    reviews = list(db().collection("reviews").where("seller_id", "==", sellerId).stream())
-    avg_rating = 0.0
-    if reviews:
-        avg_rating = sum(int((r.to_dict() or {}).get("rating") or 0) for r in reviews) / len(reviews)
-
+    # materialized in seller_stats/{sellerId}, kept current by the write paths
+    stats = await seller_stats.get(sellerId)
+    reviews = int(stats.get("total_reviews") or 0)
     return {
         "seller_id": sellerId,
-        "total_products": len(products),
-        "active_products": len(active_products),
-        "total_orders": len(orders),
-        "pending_orders": len(pending_orders),
-        "completed_orders": len(completed_orders),
-        "total_revenue": revenue,
-        "average_rating": avg_rating,
-        "total_reviews": len(reviews),
-        "last_updated": now_iso()
+        "total_products": int(stats.get("total_products") or 0),
+        "active_products": int(stats.get("active_products") or 0),
+        "total_orders": int(stats.get("total_orders") or 0),
+        "pending_orders": int(stats.get("pending_orders") or 0),
+        "completed_orders": int(stats.get("completed_orders") or 0),
+        "total_revenue": float(stats.get("total_revenue") or 0),
+        "average_rating": float(stats.get("rating_sum") or 0) / reviews if reviews else 0.0,
+        "total_reviews": reviews,
+        "last_updated": stats.get("last_updated") or now_iso()
     }
 
 @router.get("/{sellerId}/products")
-def get_seller_products(sellerId: str):
-    docs = db().collection("products").where("seller_id", "==", sellerId).stream()
-    return {"items": [d.to_dict() for d in docs]}
+async def get_seller_products(
+    sellerId: str,
+    request: Request,
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    fields: str | None = None
+):
+    projection = parse_fields(fields, SUMMARY_FIELDS)
+
+    async def _load():
+        if replica.ready:
+            return await replica.paginate_full(lambda d: d.get("seller_id") == sellerId, "created_at", True, limit,
+                                               cursor, projection)
+        q = adb().collection("products").where("seller_id", "==", sellerId)
+        return await paginate(q, [("created_at", DESC)], limit, cursor, projection)
+
+    params = {"seller_id": sellerId, "fields": tuple(projection) if projection is not None else None,
+              "limit": limit, "cursor": cursor}
+    return await cached(request, "seller_products", params, _load)
 
 @router.get("/{sellerId}/reviews")
-def get_seller_reviews(sellerId: str):
-    docs = db().collection("reviews").where("seller_id", "==", sellerId).stream()
-    return {"items": [d.to_dict() for d in docs]}
+async def get_seller_reviews(
+    sellerId: str,
+    request: Request,
+    limit: int = Query(default=PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: str | None = None,
+    summary: bool = False
+):
+    return await reviews.seller_reviews_page(request, sellerId, limit, cursor, summary)
 
 # Dashboard Stats APIs (Seller)
 @router.get("/{sellerId}/dashboard-stats")
-def seller_dashboard_stats(sellerId: str, user=Depends(require_seller_approved)):
+async def seller_dashboard_stats(sellerId: str, user=Depends(require_seller_approved)):
     if user["role"] == "seller" and user["uid"] != sellerId:
         raise HTTPException(403, detail="Forbidden")
 
-    products = list(db().collection("products").where("seller_id", "==", sellerId).stream())
-    orders = list(db().collection("orders").where("seller_id", "==", sellerId).stream())
-
-    return {"products": len(products), "orders": len(orders)}
+    stats = await seller_stats.get(sellerId)
+    return {"products": int(stats.get("total_products") or 0), "orders": int(stats.get("total_orders") or 0)}
@@ -1,20 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.core.firebase import db
+from fastapi import APIRouter, Depends, HTTPException, Request
+from app.core.firebase import adb
 from app.core.utils import gen_uuid, now_iso
 from app.core.deps import require_roles
+from app.utils.conditional import conditional
+from app.utils.response_cache import cached, invalidate
 
 router = APIRouter()
 
+async def all_sections() -> list[dict]:
+    return [d.to_dict() for d in await adb().collection("site_content").get()]
+
 @router.get("/{section}")
-def get_site_content_section(section: str):
+async def get_site_content_section(section: str, request: Request):
     # section is unique field; we store doc id = section for easier access
-    doc = db().collection("site_content").document(section).get()
+    doc = await adb().collection("site_content").document(section).get()
     if not doc.exists:
-        return {"id": None, "section": section, "content": {}}
-    return doc.to_dict()
+        return conditional(request, {"id": None, "section": section, "content": {}})
+    data = doc.to_dict()
+    return conditional(request, data, data.get("updated_at"))
 
 @router.put("/{section}")
-def update_site_content_section(section: str, payload: dict, user=Depends(require_roles("admin"))):
+async def update_site_content_section(section: str, payload: dict, user=Depends(require_roles("admin"))):
     t = now_iso()
     doc = {
         "id": payload.get("id") or section,
@@ -23,10 +29,13 @@ def update_site_content_section(section: str, payload: dict, user=Depends(requir
         "updated_at": t,
         "created_at": payload.get("created_at") or t
     }
-    db().collection("site_content").document(section).set(doc, merge=True)
+    await adb().collection("site_content").document(section).set(doc, merge=True)
+    invalidate("site_content")
     return {"message": "Site content updated", "section": section}
 
 @router.get("")
-def get_all_site_content():
-    docs = db().collection("site_content").stream()
-    return {"items": [d.to_dict() for d in docs]}
+async def get_all_site_content(request: Request):
+    async def _load():
+        return {"items": await all_sections()}
+
+    return await cached(request, "site_content", {}, _load)
@@ -0,0 +1,152 @@
+import bisect
+import math
+import threading
+from collections import defaultdict
+from .text import tokenize, field_text
+
+# BM25F-style: a term's frequency is weighted by the field it appears in
+FIELD_WEIGHTS = {"name": 3.0, "tags": 2.0, "category": 1.5, "origin": 1.0, "description": 1.0}
+K1 = 1.2
+B = 0.75
+# prefix expansion ("chak" -> "chakka") scores below an exact term and is bounded
+PREFIX_PENALTY = 0.7
+MIN_PREFIX_LEN = 2
+MAX_PREFIX_TERMS = 64
+
+def filter_meta(doc: dict) -> dict:
+    # the fields list filters need, so results can be filtered without Firestore
+    return {
+        "is_active": doc.get("is_active"),
+        "category": doc.get("category"),
+        "subcategory": doc.get("subcategory"),
+        "seller_id": doc.get("seller_id"),
+        "price": float(doc.get("price") or 0),
+    }
+
+def meta_filter(is_active=None, category=None, subcategory=None, min_price=None, max_price=None):
+    """Predicate over filter_meta() rows for the product list filters (None/"" = not filtered)."""
+    equality = {"is_active": None if is_active is None else bool(is_active),
+                "category": category or None, "subcategory": subcategory or None}
+    equality = {k: v for k, v in equality.items() if v is not None}
+
+    def _matches(m):
+        return (all(m[k] == v for k, v in equality.items())
+                and (min_price is None or m["price"] >= min_price)
+                and (max_price is None or m["price"] <= max_price))
+    return _matches
+
+class ProductSearchIndex:
+    """
+    Inverted index over product name/description/tags/category/origin.
+    search() only touches the postings of the query terms, so cost follows
+    the number of matches, not the catalog size.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._postings: dict[str, dict[str, float]] = {}
+        self._terms: list[str] = []  # sorted vocabulary for prefix lookups
+        self._doc_terms: dict[str, dict[str, float]] = {}
+        self._doc_len: dict[str, float] = {}
+        self._meta: dict[str, dict] = {}
+        self._total_len = 0.0
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def upsert(self, doc: dict):
+        pid = doc.get("id")
+        if not pid:
+            return
+        tf = defaultdict(float)
+        for field, weight in FIELD_WEIGHTS.items():
+            for tok in tokenize(field_text(doc.get(field))):
+                tf[tok] += weight
+        with self._lock:
+            self._remove(pid)
+            for term, freq in tf.items():
+                plist = self._postings.get(term)
+                if plist is None:
+                    plist = self._postings[term] = {}
+                    bisect.insort(self._terms, term)
+                plist[pid] = freq
+            self._doc_terms[pid] = dict(tf)
+            self._doc_len[pid] = sum(tf.values())
+            self._total_len += self._doc_len[pid]
+            self._meta[pid] = filter_meta(doc)
+
+    def remove(self, pid: str):
+        with self._lock:
+            self._remove(pid)
+
+    def _remove(self, pid: str):
+        terms = self._doc_terms.pop(pid, None)
+        if terms is None:
+            return
+        for term in terms:
+            plist = self._postings[term]
+            plist.pop(pid, None)
+            if not plist:
+                del self._postings[term]
+                del self._terms[bisect.bisect_left(self._terms, term)]
+        self._total_len -= self._doc_len.pop(pid, 0.0)
+        self._meta.pop(pid, None)
+
+    def rebuild(self, docs):
+        fresh = ProductSearchIndex()
+        for d in docs:
+            fresh.upsert(d)
+        with self._lock:
+            self._postings = fresh._postings
+            self._terms = fresh._terms
+            self._doc_terms = fresh._doc_terms
+            self._doc_len = fresh._doc_len
+            self._meta = fresh._meta
+            self._total_len = fresh._total_len
+
+    def _expand(self, token: str) -> list[tuple[str, float]]:
+        out = [(token, 1.0)] if token in self._postings else []
+        if len(token) >= MIN_PREFIX_LEN:
+            i = bisect.bisect_left(self._terms, token)
+            while i < len(self._terms) and len(out) < MAX_PREFIX_TERMS and self._terms[i].startswith(token):
+                if self._terms[i] != token:
+                    out.append((self._terms[i], PREFIX_PENALTY))
+                i += 1
+        return out
+
+    def search(self, query: str, predicate=None) -> list[tuple[str, float]]:
+        """
+        Ranked (product_id, score) for docs matching every query token (exactly
+        or by prefix); predicate(meta) can drop results by price/category/etc.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+        with self._lock:
+            n = len(self._doc_terms)
+            if not n:
+                return []
+            avgdl = self._total_len / n or 1.0
+            scores = None
+            for tok in tokens:
+                tok_scores: dict[str, float] = {}
+                for term, boost in self._expand(tok):
+                    plist = self._postings[term]
+                    idf = math.log(1 + (n - len(plist) + 0.5) / (len(plist) + 0.5))
+                    for pid, freq in plist.items():
+                        if scores is not None and pid not in scores:
+                            continue
+                        norm = freq * (K1 + 1) / (freq + K1 * (1 - B + B * self._doc_len[pid] / avgdl))
+                        s = boost * idf * norm
+                        if s > tok_scores.get(pid, 0.0):
+                            tok_scores[pid] = s
+                if scores is not None:
+                    tok_scores = {pid: s + scores[pid] for pid, s in tok_scores.items()}
+                scores = tok_scores
+                if not scores:
+                    return []
+            matches = [(pid, s) for pid, s in scores.items() if predicate is None or predicate(self._meta[pid])]
+        matches.sort(key=lambda x: (-x[1], x[0]))
+        return matches
+
+product_index = ProductSearchIndex()
@@ -0,0 +1,140 @@
+import bisect
+import heapq
+import threading
+from .text import tokenize
+
+# typeahead over product names, tags and categories: a sorted key array searched
+# with bisect. Every word-suffix of a phrase is a key, so "chi" finds "Chakka Chips".
+MAX_SCAN = 5000
+# results per (prefix, limit), dropped on every catalog change; writes are rare next to keystrokes
+MEMO_SIZE = 4096
+
+def _phrase_keys(text) -> list[str]:
+    toks = tokenize(text)
+    return [" ".join(toks[i:]) for i in range(len(toks))]
+
+class _Suggestion:
+    __slots__ = ("text", "type", "product_id", "products", "sold", "rating_sum")
+
+    def __init__(self, text: str, type_: str, product_id: str | None = None):
+        self.text = text
+        self.type = type_
+        self.product_id = product_id
+        self.products = 0
+        self.sold = 0.0
+        self.rating_sum = 0.0
+
+    def rank(self):
+        rating = self.rating_sum / self.products if self.products else 0.0
+        return (self.sold, rating)
+
+    def as_dict(self) -> dict:
+        sold, rating = self.rank()
+        out = {"text": self.text, "type": self.type, "total_sold": sold, "rating": round(rating, 2)}
+        if self.product_id:
+            out["product_id"] = self.product_id
+        return out
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys: list[tuple[str, tuple]] = []  # sorted (key, suggestion id)
+        self._suggestions: dict[tuple, _Suggestion] = {}
+        self._by_product: dict[str, tuple[list[tuple], float, float]] = {}
+        self._memo: dict[tuple[str, int], list[dict]] = {}
+        self._bulk = False  # rebuild appends unsorted and sorts once
+
+    def _sources(self, doc: dict) -> list[tuple[tuple, str, str, str | None]]:
+        pid = doc["id"]
+        out = [(("product", pid), doc.get("name") or "", "product", pid)]
+        for tag in doc.get("tags") or []:
+            out.append((("tag", " ".join(tokenize(tag))), str(tag), "tag", None))
+        if doc.get("category"):
+            out.append((("category", " ".join(tokenize(doc["category"]))), str(doc["category"]), "category", None))
+        return [s for s in out if s[0][1] and tokenize(s[1])]
+
+    def upsert(self, doc: dict):
+        pid = doc.get("id")
+        if not pid:
+            return
+        with self._lock:
+            self._memo.clear()
+            self._remove(pid)
+            if doc.get("is_active") is False:
+                return
+            sold = float(doc.get("total_sold") or 0)
+            rating = float(doc.get("rating") or 0)
+            sids = []
+            for sid, text, type_, product_id in self._sources(doc):
+                if sid in sids:
+                    continue
+                sug = self._suggestions.get(sid)
+                if sug is None:
+                    sug = self._suggestions[sid] = _Suggestion(text, type_, product_id)
+                    for key in _phrase_keys(text):
+                        if self._bulk:
+                            self._keys.append((key, sid))
+                        else:
+                            bisect.insort(self._keys, (key, sid))
+                sug.products += 1
+                sug.sold += sold
+                sug.rating_sum += rating
+                sids.append(sid)
+            self._by_product[pid] = (sids, sold, rating)
+
+    def remove(self, pid: str):
+        with self._lock:
+            self._memo.clear()
+            self._remove(pid)
+
+    def _remove(self, pid: str):
+        entry = self._by_product.pop(pid, None)
+        if entry is None:
+            return
+        sids, sold, rating = entry
+        for sid in sids:
+            sug = self._suggestions[sid]
+            sug.products -= 1
+            sug.sold -= sold
+            sug.rating_sum -= rating
+            if sug.products <= 0:
+                del self._suggestions[sid]
+                for key in _phrase_keys(sug.text):
+                    i = bisect.bisect_left(self._keys, (key, sid))
+                    if i < len(self._keys) and self._keys[i] == (key, sid):
+                        del self._keys[i]
+
+    def rebuild(self, docs):
+        fresh = SuggestIndex()
+        fresh._bulk = True
+        for d in docs:
+            fresh.upsert(d)
+        fresh._keys.sort()
+        with self._lock:
+            self._keys = fresh._keys
+            self._suggestions = fresh._suggestions
+            self._by_product = fresh._by_product
+            self._memo = {}
+
+    def suggest(self, prefix: str, limit: int = 8) -> list[dict]:
+        p = " ".join(tokenize(prefix))
+        if not p:
+            return []
+        with self._lock:
+            hit = self._memo.get((p, limit))
+            if hit is not None:
+                return hit
+            seen = set()
+            i = bisect.bisect_left(self._keys, (p,))
+            end = min(len(self._keys), i + MAX_SCAN)
+            while i < end and self._keys[i][0].startswith(p):
+                seen.add(self._keys[i][1])
+                i += 1
+            top = heapq.nlargest(limit, (self._suggestions[sid] for sid in seen), key=lambda s: (s.rank(), s.type == "product"))
+            out = [s.as_dict() for s in top]
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[(p, limit)] = out
+            return out
+
+suggest_index = SuggestIndex()
@@ -0,0 +1,32 @@
+import re
+import unicodedata
+
+# a token is a run of letters and digits of any script plus combining marks:
+# Malayalam (and other Indic) words carry vowel signs and viramas, which \w
+# alone would split them at
+_MARKS = "".join(chr(i) for i in range(0x300, 0x10000) if unicodedata.category(chr(i)).startswith("M"))
+_TOKEN_RE = re.compile(r"(?:[^\W_]|[" + re.escape(_MARKS) + "])+")
+
+def normalize(text) -> str:
+    # lowercase, strip accents from Latin letters (other scripts keep their
+    # marks); non-strings (None, numbers) become ""/str
+    if text is None:
+        return ""
+    out, latin = [], False
+    for c in unicodedata.normalize("NFKD", str(text)):
+        if unicodedata.combining(c):
+            if latin:
+                continue
+        else:
+            latin = c < "\u0250"
+        out.append(c)
+    return "".join(out).lower()
+
+def tokenize(text) -> list[str]:
+    return _TOKEN_RE.findall(normalize(text))
+
+def field_text(value) -> str:
+    # tags are lists; everything else is a scalar
+    if isinstance(value, (list, tuple)):
+        return " ".join(str(v) for v in value if v)
+    return "" if value is None else str(value)
@@ -0,0 +1,115 @@
+import re
+import threading
+from .text import tokenize, field_text
+from .index import filter_meta
+
+# Typo tolerance for name/tag words ("chaka" ~ "chakka", "kapa" ~ "kappa").
+# Words are squashed (repeated letters collapsed, the usual Manglish variation)
+# and compared by trigram Jaccard similarity. Candidates come from the trigram
+# postings of the query word, so only words sharing grams are ever scored.
+FIELDS = ("name", "tags")
+MIN_SIMILARITY = 0.4
+
+_REPEATS = re.compile(r"(.)\1+")
+
+def squash(word: str) -> str:
+    return _REPEATS.sub(r"\1", word)
+
+def trigrams(word: str) -> set[str]:
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+class TrigramIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._grams: dict[str, set[str]] = {}      # trigram -> squashed words
+        self._word_grams: dict[str, set[str]] = {}
+        self._word_docs: dict[str, set[str]] = {}  # squashed word -> product ids
+        self._doc_words: dict[str, set[str]] = {}
+        self._meta: dict[str, dict] = {}
+
+    def upsert(self, doc: dict):
+        pid = doc.get("id")
+        if not pid:
+            return
+        words = {squash(t) for f in FIELDS for t in tokenize(field_text(doc.get(f))) if len(t) > 1}
+        with self._lock:
+            self._remove(pid)
+            for w in words:
+                docs = self._word_docs.get(w)
+                if docs is None:
+                    docs = self._word_docs[w] = set()
+                    grams = self._word_grams[w] = trigrams(w)
+                    for g in grams:
+                        self._grams.setdefault(g, set()).add(w)
+                docs.add(pid)
+            self._doc_words[pid] = words
+            self._meta[pid] = filter_meta(doc)
+
+    def remove(self, pid: str):
+        with self._lock:
+            self._remove(pid)
+
+    def _remove(self, pid: str):
+        words = self._doc_words.pop(pid, None)
+        if words is None:
+            return
+        self._meta.pop(pid, None)
+        for w in words:
+            docs = self._word_docs[w]
+            docs.discard(pid)
+            if not docs:
+                del self._word_docs[w]
+                for g in self._word_grams.pop(w):
+                    ws = self._grams[g]
+                    ws.discard(w)
+                    if not ws:
+                        del self._grams[g]
+
+    def rebuild(self, docs):
+        fresh = TrigramIndex()
+        for d in docs:
+            fresh.upsert(d)
+        with self._lock:
+            self._grams = fresh._grams
+            self._word_grams = fresh._word_grams
+            self._word_docs = fresh._word_docs
+            self._doc_words = fresh._doc_words
+            self._meta = fresh._meta
+
+    def _similar_words(self, token: str) -> dict[str, float]:
+        q = trigrams(squash(token))
+        shared: dict[str, int] = {}
+        for g in q:
+            for w in self._grams.get(g, ()):
+                shared[w] = shared.get(w, 0) + 1
+        out = {}
+        for w, n in shared.items():
+            sim = n / (len(q) + len(self._word_grams[w]) - n)
+            if sim >= MIN_SIMILARITY:
+                out[w] = sim
+        return out
+
+    def search(self, query: str, predicate=None) -> list[tuple[str, float]]:
+        """Ranked (product_id, score); every query word must fuzzily match a name/tag word."""
+        tokens = [t for t in dict.fromkeys(tokenize(query)) if len(t) > 1]
+        if not tokens:
+            return []
+        with self._lock:
+            scores = None
+            for tok in tokens:
+                tok_scores: dict[str, float] = {}
+                for w, sim in self._similar_words(tok).items():
+                    for pid in self._word_docs[w]:
+                        if sim > tok_scores.get(pid, 0.0):
+                            tok_scores[pid] = sim
+                if scores is not None:
+                    tok_scores = {pid: s + scores[pid] for pid, s in tok_scores.items() if pid in scores}
+                scores = tok_scores
+                if not scores:
+                    return []
+            matches = [(pid, s) for pid, s in scores.items() if predicate is None or predicate(self._meta[pid])]
+        matches.sort(key=lambda x: (-x[1], x[0]))
+        return matches
+
+trigram_index = TrigramIndex()
@@ -0,0 +1,18 @@
+from app.core.cache import AsyncLoadingCache
+from app.core.config import settings
+from app.core.firebase import adb
+
+# Per-worker read-through cache of full blog documents, shared by the id and
+# slug detail endpoints. This worker's writes invalidate it; other workers'
+# writes show up after BLOG_CACHE_TTL.
+
+async def _load(bid: str) -> dict | None:
+    snap = await adb().collection("blogs").document(bid).get()
+    return snap.to_dict() if snap.exists else None
+
+blog_cache = AsyncLoadingCache(
+    _load,
+    maxsize=settings.BLOG_CACHE_SIZE,
+    ttl=settings.BLOG_CACHE_TTL,
+    negative_ttl=settings.NOT_FOUND_CACHE_TTL,
+)
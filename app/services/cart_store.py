@@ -0,0 +1,180 @@
+from fastapi import HTTPException
+from firebase_admin import firestore_async
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.firebase import adb
+from app.core.utils import gen_uuid, now_iso
+from app.utils.firestore_helpers import BATCH_LIMIT, bulk_delete
+
+# Cart storage. CART_STORAGE=lines keeps one cart_items document per line;
+# CART_STORAGE=document keeps carts/{userId} with a `lines` map keyed by
+# product (and variant), so a cart is one read, adding an existing product
+# increments its quantity and clearing is one write. Both stores return lines
+# in the cart_items shape: id, user_id, product_id, product_variant_id,
+# quantity, updated_at (+ created_at for line documents and migrated lines).
+
+def line_key(product_id: str, variant_id: str | None = None) -> str:
+    return f"{product_id}:{variant_id}" if variant_id else product_id
+
+class LineCartStore:
+    def _items(self):
+        return adb().collection("cart_items")
+
+    async def list(self, user_id: str) -> list[dict]:
+        docs = await self._items().where("user_id", "==", user_id).get()
+        return [d.to_dict() for d in docs]
+
+    async def add(self, user_id: str, product_id: str, variant_id: str | None, quantity: int) -> str:
+        t = now_iso()
+        cid = gen_uuid()
+        await self._items().document(cid).set({
+            "id": cid,
+            "user_id": user_id,
+            "product_id": product_id,
+            "product_variant_id": variant_id,
+            "quantity": quantity,
+            "created_at": t,
+            "updated_at": t
+        })
+        return cid
+
+    async def set_quantity(self, user_id: str, item_id: str, quantity: int | None):
+        doc = await self._items().document(item_id).get()
+        if not doc.exists:
+            raise HTTPException(404, detail="Cart item not found")
+        data = doc.to_dict() or {}
+        if data.get("user_id") != user_id:
+            raise HTTPException(403, detail="Forbidden")
+        upd = {
+            "quantity": quantity if quantity is not None else int(data.get("quantity", 1)),
+            "updated_at": now_iso()
+        }
+        await self._items().document(item_id).set(upd, merge=True)
+
+    async def remove(self, user_id: str, item_id: str):
+        doc = await self._items().document(item_id).get()
+        if doc.exists and (doc.to_dict() or {}).get("user_id") != user_id:
+            raise HTTPException(403, detail="Forbidden")
+        await self._items().document(item_id).delete()
+
+    async def clear(self, user_id: str):
+        docs = await self._items().where("user_id", "==", user_id).select([]).get()
+        await bulk_delete(d.reference for d in docs)
+
+class DocumentCartStore:
+    def __init__(self):
+        # users whose legacy cart_items rows are known to be migrated (per worker)
+        self._migrated = TTLCache(maxsize=100000)
+
+    def _ref(self, user_id: str):
+        return adb().collection("carts").document(user_id)
+
+    async def _ensure(self, user_id: str):
+        """Migrate legacy cart_items rows on first touch; returns the cart snapshot if it was read."""
+        snap = None
+        if not self._migrated.get(user_id):
+            snap = await self._ref(user_id).get()
+            if not snap.exists:
+                await migrate_user(user_id)
+                snap = None
+            self._migrated.set(user_id, True)
+        return snap
+
+    async def list(self, user_id: str) -> list[dict]:
+        snap = await self._ensure(user_id)
+        if snap is None:
+            snap = await self._ref(user_id).get()
+        lines = (snap.to_dict() or {}).get("lines") or {}
+        return [{"id": key, "user_id": user_id, **line} for key, line in lines.items()]
+
+    async def add(self, user_id: str, product_id: str, variant_id: str | None, quantity: int) -> str:
+        await self._ensure(user_id)
+        t = now_iso()
+        key = line_key(product_id, variant_id)
+        # no read: a new line gets created, an existing one just grows
+        await self._ref(user_id).set({
+            "user_id": user_id,
+            "lines": {key: {
+                "product_id": product_id,
+                "product_variant_id": variant_id,
+                "quantity": firestore_async.Increment(quantity),
+                "updated_at": t,
+            }},
+            "updated_at": t,
+        }, merge=True)
+        return key
+
+    async def set_quantity(self, user_id: str, item_id: str, quantity: int | None):
+        await self._ensure(user_id)
+        ref = self._ref(user_id)
+
+        @firestore_async.async_transactional
+        async def _update(transaction):
+            snap = await ref.get(transaction=transaction)
+            line = ((snap.to_dict() or {}).get("lines") or {}).get(item_id)
+            if line is None:
+                raise HTTPException(404, detail="Cart item not found")
+            if quantity is None:
+                return
+            t = now_iso()
+            transaction.set(ref, {"lines": {item_id: {"quantity": quantity, "updated_at": t}}, "updated_at": t},
+                            merge=True)
+
+        await _update(adb().transaction())
+
+    async def remove(self, user_id: str, item_id: str):
+        await self._ensure(user_id)
+        await self._ref(user_id).set({"lines": {item_id: firestore_async.DELETE_FIELD}, "updated_at": now_iso()},
+                                     merge=True)
+
+    async def clear(self, user_id: str):
+        await self._ensure(user_id)
+        # keeps the document, so the user stays marked as migrated
+        await self._ref(user_id).set({"user_id": user_id, "lines": {}, "updated_at": now_iso()})
+
+async def migrate_user(user_id: str) -> int:
+    """
+    Fold a user's cart_items rows into carts/{userId} (same product/variant
+    lines are summed) and delete the rows. Returns the row count.
+    """
+    rows = await adb().collection("cart_items").where("user_id", "==", user_id).get()
+    t = now_iso()
+    lines: dict[str, dict] = {}
+    for r in rows:
+        d = r.to_dict() or {}
+        if not d.get("product_id"):
+            continue
+        key = line_key(d["product_id"], d.get("product_variant_id"))
+        line = lines.setdefault(key, {
+            "product_id": d["product_id"],
+            "product_variant_id": d.get("product_variant_id"),
+            "quantity": 0,
+            "created_at": d.get("created_at") or t,
+            "updated_at": d.get("updated_at") or t,
+        })
+        line["quantity"] += int(d.get("quantity") or 0)
+
+    if len(rows) < BATCH_LIMIT:
+        # the usual case: cart and row deletes in one atomic batch
+        batch = adb().batch()
+        batch.set(adb().collection("carts").document(user_id), {"user_id": user_id, "lines": lines, "updated_at": t},
+                  merge=True)
+        for r in rows:
+            batch.delete(r.reference)
+        await batch.commit()
+    else:
+        # cart first, so a failure part-way through the deletes loses no line
+        await adb().collection("carts").document(user_id).set({"user_id": user_id, "lines": lines, "updated_at": t},
+                                                             merge=True)
+        await bulk_delete(r.reference for r in rows)
+    return len(rows)
+
+async def migrate_all() -> dict:
+    """Backfill for CART_STORAGE=document: migrate every user that still has cart_items rows."""
+    rows = await adb().collection("cart_items").select(["user_id"]).get()
+    users = {(r.to_dict() or {}).get("user_id") for r in rows} - {None}
+    for uid in users:
+        await migrate_user(uid)
+    return {"users": len(users), "rows": len(rows)}
+
+store = DocumentCartStore() if settings.CART_STORAGE == "document" else LineCartStore()
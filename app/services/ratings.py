@@ -0,0 +1,228 @@
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+from firebase_admin import firestore_async
+from app.core.cache import TTLCache
+from app.core.firebase import adb
+from app.core.utils import now_iso
+from app.utils.firestore_helpers import BulkWriter
+
+# Review aggregates for products and seller_profiles.
+#
+# Totals live in {parent}/rating_shards/{i} as count, sum and a 1-5 histogram.
+# A parent starts with one shard: the review transaction reads it and writes the
+# parent's rating/review_count/rating_histogram exactly. Once a parent gets more
+# than HOT_REVIEWS_PER_MINUTE reviews on this worker it is switched to HOT_SHARDS
+# shards; reviews then Increment() a random shard without reading it, and the
+# parent summary is recomputed from the shards at most every HOT_REFRESH_SECONDS,
+# with one trailing refresh at the end of the window so the last reviews of a
+# burst are not left out. A parent sharded for HOT_COOLDOWN_SECONDS that is no
+# longer hot is folded back into one shard by its next review (a parent that
+# gets none stays sharded until rebuild(); summary() reads its shards in one
+# get_all).
+
+log = logging.getLogger(__name__)
+
+STARS = ("1", "2", "3", "4", "5")
+HOT_SHARDS = 10
+HOT_REVIEWS_PER_MINUTE = 30
+HOT_REFRESH_SECONDS = 10
+HOT_COOLDOWN_SECONDS = 3600
+
+_recent = TTLCache(maxsize=10000, ttl=120)     # (path, minute) -> reviews seen
+_refreshed = TTLCache(maxsize=10000, ttl=HOT_REFRESH_SECONDS)
+_trailing: dict[str, asyncio.Task] = {}
+
+def product_ref(pid: str):
+    return adb().collection("products").document(pid)
+
+def seller_ref(seller_id: str):
+    return adb().collection("seller_profiles").document(seller_id)
+
+def _shard(parent, i: int):
+    return parent.collection("rating_shards").document(str(i))
+
+def _empty() -> dict:
+    return {"count": 0, "sum": 0, "histogram": {s: 0 for s in STARS}}
+
+def _add(total: dict, shard: dict | None):
+    if not shard:
+        return
+    total["count"] += int(shard.get("count") or 0)
+    total["sum"] += int(shard.get("sum") or 0)
+    for s, n in (shard.get("histogram") or {}).items():
+        if s in total["histogram"]:
+            total["histogram"][s] += int(n or 0)
+
+def _parent_fields(total: dict) -> dict:
+    count = total["count"]
+    return {
+        "rating": round(total["sum"] / count, 2) if count else 0,
+        "review_count": count,
+        "rating_histogram": total["histogram"],
+    }
+
+def _as_summary(fields: dict) -> dict:
+    return {
+        "average": fields.get("rating") or 0,
+        "count": int(fields.get("review_count") or 0),
+        "histogram": {s: int((fields.get("rating_histogram") or {}).get(s) or 0) for s in STARS},
+    }
+
+def _minute_key(parent):
+    return parent.path, int(time.time() // 60)
+
+def _is_hot(parent) -> bool:
+    """Whether one more review makes the parent hot on this worker (nothing is counted)."""
+    return _recent.get(_minute_key(parent), 0) + 1 > HOT_REVIEWS_PER_MINUTE
+
+def _cooled(parent, data: dict) -> bool:
+    # sharded long enough and quiet again: back to one shard
+    since = float(data.get("rating_sharded_at") or 0)
+    return time.time() - since >= HOT_COOLDOWN_SECONDS and not _is_hot(parent)
+
+def note_reviews(parents: list):
+    """Count a committed review against its parents; call after the transaction, not inside it."""
+    for parent in parents:
+        key = _minute_key(parent)
+        _recent.set(key, _recent.get(key, 0) + 1)
+
+async def record(transaction, parents: list, rating: int) -> dict:
+    """
+    Add one `rating` to each parent (product/seller refs that exist) inside
+    `transaction`; parents that don't exist are skipped. All reads happen here,
+    so call it before any transaction writes. Returns {path: parent fields
+    written} for the parents updated inline.
+    """
+    if not parents:
+        return {}
+    snaps = {s.reference.path: s async for s in adb().get_all(parents, transaction=transaction) if s.exists}
+    parents = [p for p in parents if p.path in snaps]
+    data = {p.path: snaps[p.path].to_dict() or {} for p in parents}
+    shards = {p.path: int(data[p.path].get("rating_shards") or 1) for p in parents}
+    # written inline: single-shard parents, and sharded ones being folded back
+    inline = {p.path for p in parents if shards[p.path] <= 1 or _cooled(p, data[p.path])}
+    refs = [_shard(p, i) for p in parents if p.path in inline for i in range(shards[p.path])]
+    read = {s.reference.path: s async for s in adb().get_all(refs, transaction=transaction)} if refs else {}
+
+    star = str(rating)
+    written = {}
+    for parent in parents:
+        d, n = data[parent.path], shards[parent.path]
+        if parent.path in inline:
+            total = _empty()
+            found = [s for s in (read.get(_shard(parent, i).path) for i in range(n)) if s is not None and s.exists]
+            for snap in found:
+                _add(total, snap.to_dict())
+            if not found and d.get("review_count"):
+                # totals from before shards existed; their histogram needs rebuild()
+                total["count"] = int(d["review_count"])
+                total["sum"] = round(float(d.get("rating") or 0) * total["count"])
+            _add(total, {"count": 1, "sum": rating, "histogram": {star: 1}})
+            transaction.set(_shard(parent, 0), total)
+            for i in range(1, n):
+                transaction.delete(_shard(parent, i))
+            written[parent.path] = _parent_fields(total)
+            upd = {**written[parent.path]}
+            if _is_hot(parent):
+                upd["rating_shards"] = HOT_SHARDS
+                upd["rating_sharded_at"] = int(time.time())
+            elif n > 1:
+                upd["rating_shards"] = 1
+            transaction.set(parent, upd, merge=True)
+        else:
+            transaction.set(_shard(parent, random.randrange(n)), {
+                "count": firestore_async.Increment(1),
+                "sum": firestore_async.Increment(rating),
+                "histogram": {star: firestore_async.Increment(1)},
+            }, merge=True)
+    return written
+
+async def _read_shards(parent, shards: int, transaction=None) -> dict:
+    refs = [_shard(parent, i) for i in range(shards)]
+    total = _empty()
+    async for s in adb().get_all(refs, transaction=transaction):
+        if s.exists:
+            _add(total, s.to_dict())
+    return total
+
+async def refresh(parent, force: bool = False, on_refresh=None) -> dict | None:
+    """
+    Recompute a sharded parent's summary fields; throttled per worker unless
+    forced. A throttled call returns None and makes sure a trailing refresh
+    runs when the window ends; that one passes its fields to on_refresh().
+    """
+    if not force and _refreshed.get(parent.path):
+        if parent.path not in _trailing:
+            _trailing[parent.path] = asyncio.ensure_future(_refresh_later(parent, on_refresh))
+        return None
+    _refreshed.set(parent.path, True)
+
+    @firestore_async.async_transactional
+    async def _refresh(transaction):
+        snap = await parent.get(transaction=transaction)
+        if not snap.exists:
+            return None
+        shards = int((snap.to_dict() or {}).get("rating_shards") or 1)
+        fields = _parent_fields(await _read_shards(parent, shards, transaction))
+        transaction.set(parent, fields, merge=True)
+        return fields
+
+    return await _refresh(adb().transaction())
+
+async def _refresh_later(parent, on_refresh):
+    try:
+        await asyncio.sleep(HOT_REFRESH_SECONDS)
+        _trailing.pop(parent.path, None)
+        fields = await refresh(parent, force=True)
+        if fields and on_refresh is not None:
+            on_refresh(fields)
+    except Exception:
+        log.exception("rating refresh failed for %s", parent.path)
+    finally:
+        if _trailing.get(parent.path) is asyncio.current_task():
+            del _trailing[parent.path]
+
+async def summary(parent) -> dict:
+    """{"average", "count", "histogram"} for a product or seller without reading reviews."""
+    snap = await parent.get()
+    data = snap.to_dict() or {}
+    shards = int(data.get("rating_shards") or 1)
+    if shards > 1:
+        # the parent fields may lag a hot parent by HOT_REFRESH_SECONDS; shards don't
+        return _as_summary(_parent_fields(await _read_shards(parent, shards)))
+    return _as_summary(data)
+
+async def rebuild() -> dict:
+    """Backfill: recompute every product and seller aggregate from the reviews collection."""
+    totals = {"products": defaultdict(_empty), "seller_profiles": defaultdict(_empty)}
+    for r in await adb().collection("reviews").select(["product_id", "seller_id", "rating"]).get():
+        d = r.to_dict() or {}
+        rating = int(d.get("rating") or 0)
+        if str(rating) not in STARS:
+            continue
+        one = {"count": 1, "sum": rating, "histogram": {str(rating): 1}}
+        if d.get("product_id"):
+            _add(totals["products"][d["product_id"]], one)
+        if d.get("seller_id"):
+            _add(totals["seller_profiles"][d["seller_id"]], one)
+
+    written = 0
+    writer = BulkWriter()
+    t = now_iso()
+    for collection, by_id in totals.items():
+        parents = [adb().collection(collection).document(doc_id) for doc_id in by_id]
+        async for snap in adb().get_all(parents, field_paths=["rating_shards"]):
+            if not snap.exists:
+                continue
+            parent, total = snap.reference, by_id[snap.id]
+            # everything goes to shard 0 and the other shards are emptied
+            writer.set(_shard(parent, 0), total)
+            for i in range(1, int((snap.to_dict() or {}).get("rating_shards") or 1)):
+                writer.delete(_shard(parent, i))
+            writer.set(parent, {**_parent_fields(total), "rating_shards": 1, "updated_at": t}, merge=True)
+            written += 1
+    await writer.commit()
+    return {"rebuilt": written}
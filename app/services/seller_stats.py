@@ -0,0 +1,112 @@
+import asyncio
+from firebase_admin import firestore_async
+from app.core.firebase import adb
+from app.core.utils import now_iso
+from app.utils.firestore_helpers import count, total
+
+# seller_stats/{sellerId} holds running totals for the seller dashboards.
+# Writers add Increment() deltas in the same batch/transaction as the change
+# they describe; rebuild() recomputes a document from scratch and stamps it
+# with rebuilt_at. A document without that stamp was started by deltas alone
+# (seller from before stats existed) and is rebuilt on first read.
+
+PENDING_STATUSES = ("pending", "confirmed", "packed", "shipped")
+COMPLETED_STATUS = "delivered"
+
+def stats_ref(seller_id: str):
+    return adb().collection("seller_stats").document(seller_id)
+
+def _status_counters(status: str | None) -> dict:
+    if status in PENDING_STATUSES:
+        return {"pending_orders": 1}
+    if status == COMPLETED_STATUS:
+        return {"completed_orders": 1}
+    return {}
+
+def order_created(order: dict) -> dict:
+    return {
+        "total_orders": 1,
+        "total_revenue": float(order.get("total_amount") or 0),
+        **_status_counters(order.get("status")),
+    }
+
+def order_status_changed(old: str | None, new: str | None) -> dict:
+    delta = dict(_status_counters(new))
+    for k, v in _status_counters(old).items():
+        delta[k] = delta.get(k, 0) - v
+    return delta
+
+def product_created(product: dict) -> dict:
+    return {"total_products": 1, "active_products": 1 if product.get("is_active") is True else 0}
+
+def product_deleted(product: dict) -> dict:
+    return {k: -v for k, v in product_created(product).items()}
+
+def product_active_changed(was: bool, now: bool) -> dict:
+    return {"active_products": int(now) - int(was)}
+
+def review_created(rating: int) -> dict:
+    return {"total_reviews": 1, "rating_sum": rating}
+
+def apply(writer, seller_id: str | None, delta: dict):
+    """Queue the delta on a batch or transaction; zero deltas are skipped."""
+    delta = {k: v for k, v in delta.items() if v}
+    if not seller_id or not delta:
+        return
+    data = {k: firestore_async.Increment(v) for k, v in delta.items()}
+    data["seller_id"] = seller_id
+    data["last_updated"] = now_iso()
+    writer.set(stats_ref(seller_id), data, merge=True)
+
+async def rebuild(seller_id: str) -> dict:
+    """
+    Recompute one seller's document with aggregation queries (no documents
+    read). Counting and writing happen in one transaction, which also reads
+    the stats document, so a concurrent delta is either counted or applied on
+    top of the result, never lost.
+    """
+    ref = stats_ref(seller_id)
+    products = adb().collection("products").where("seller_id", "==", seller_id)
+    orders = adb().collection("orders").where("seller_id", "==", seller_id)
+    reviews = adb().collection("reviews").where("seller_id", "==", seller_id)
+    keys = ("total_products", "active_products", "total_orders", "pending_orders",
+            "completed_orders", "total_revenue", "total_reviews", "rating_sum")
+
+    @firestore_async.async_transactional
+    async def _rebuild(transaction):
+        await ref.get(transaction=transaction)
+        values = await asyncio.gather(
+            count(products, transaction),
+            count(products.where("is_active", "==", True), transaction),
+            count(orders, transaction),
+            count(orders.where("status", "in", list(PENDING_STATUSES)), transaction),
+            count(orders.where("status", "==", COMPLETED_STATUS), transaction),
+            total(orders, "total_amount", transaction),
+            count(reviews, transaction),
+            total(reviews, "rating", transaction),
+        )
+        t = now_iso()
+        doc = {"seller_id": seller_id, **dict(zip(keys, values)), "last_updated": t, "rebuilt_at": t}
+        transaction.set(ref, doc)
+        return doc
+
+    return await _rebuild(adb().transaction())
+
+async def rebuild_all(concurrency: int = 8) -> int:
+    sem = asyncio.Semaphore(concurrency)
+
+    async def _one(seller_id):
+        async with sem:
+            await rebuild(seller_id)
+
+    sellers = await adb().collection("seller_profiles").select([]).get()
+    await asyncio.gather(*(_one(s.id) for s in sellers))
+    return len(sellers)
+
+async def get(seller_id: str) -> dict:
+    snap = await stats_ref(seller_id).get()
+    data = (snap.to_dict() or {}) if snap.exists else {}
+    if data.get("rebuilt_at"):
+        return data
+    # never rebuilt: missing, or holding only the deltas written since deploy
+    return await rebuild(seller_id)
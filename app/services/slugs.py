@@ -0,0 +1,82 @@
+import threading
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.services import unique_keys
+from app.services.unique_keys import normalize
+
+# Per-worker slug -> id maps for the slug-addressed detail endpoints. They are
+# kept current by this worker's writes (products also by the catalog loads); a
+# slug the map doesn't know is resolved through its unique_keys reservation and
+# remembered. Another worker may have moved a slug since, so lookup() checks the
+# loaded document and re-resolves once when it doesn't match.
+
+class SlugMap:
+    def __init__(self, scope: str):
+        self._scope = scope
+        self._lock = threading.RLock()
+        self._ids: dict[str, str] = {}
+        self._slugs: dict[str, str] = {}
+        self._missing = TTLCache(maxsize=10000, ttl=settings.NOT_FOUND_CACHE_TTL)
+
+    def __len__(self):
+        return len(self._ids)
+
+    def put(self, doc_id: str, slug):
+        key = normalize(slug)
+        with self._lock:
+            old = self._slugs.pop(doc_id, None)
+            if old is not None and self._ids.get(old) == doc_id:
+                del self._ids[old]
+            if key:
+                self._ids[key] = doc_id
+                self._slugs[doc_id] = key
+                self._missing.pop(key)
+
+    def remove(self, doc_id: str):
+        self.put(doc_id, None)
+
+    def forget(self, slug):
+        with self._lock:
+            doc_id = self._ids.pop(normalize(slug), None)
+            if doc_id is not None:
+                self._slugs.pop(doc_id, None)
+
+    def rebuild(self, docs):
+        ids, slugs = {}, {}
+        for d in docs:
+            key = normalize(d.get("slug"))
+            if key and d.get("id"):
+                ids[key] = d["id"]
+                slugs[d["id"]] = key
+        with self._lock:
+            self._ids, self._slugs = ids, slugs
+
+    async def resolve(self, slug) -> str | None:
+        key = normalize(slug)
+        if not key or self._missing.get(key):
+            return None
+        doc_id = self._ids.get(key)
+        if doc_id is None:
+            doc_id = await unique_keys.owner(self._scope, key)
+            if doc_id is None:
+                self._missing.set(key, True)
+            else:
+                self.put(doc_id, key)
+        return doc_id
+
+    async def lookup(self, slug, cache) -> dict | None:
+        """The document for `slug`, read through `cache` (an AsyncLoadingCache by id)."""
+        for _ in range(2):
+            doc_id = await self.resolve(slug)
+            if doc_id is None:
+                return None
+            doc = await cache.get(doc_id)
+            if doc is not None and normalize(doc.get("slug")) == normalize(slug):
+                return doc
+            # stale map entry or cached document: go back to the reservation
+            self.forget(slug)
+            cache.invalidate(doc_id)
+        return None
+
+product_slugs = SlugMap(unique_keys.PRODUCT_KEYS["slug"])
+blog_slugs = SlugMap(unique_keys.BLOG_KEYS["slug"])
@@ -0,0 +1,113 @@
+from urllib.parse import quote
+from fastapi import HTTPException
+from app.core.firebase import adb
+from app.core.utils import now_iso
+from app.utils.firestore_helpers import BulkWriter
+
+# Uniqueness index for slugs and SKUs. Every claimed value is a reservation
+# document unique_keys/{scope}:{normalized value} naming its owner. It is
+# create()d in the same batch/transaction as the owner's write, so a value that
+# is already taken fails the whole commit with AlreadyExists and two concurrent
+# creates can't both win. Changing or deleting the owner releases the old
+# reservation in the same commit. slug -> id lookups are one document get.
+# Documents from before reservations existed hold their values without one
+# until rebuild() backfills them; owner() falls back to querying the owning
+# collection for those, and check() runs it before a write.
+
+COLLECTION = "unique_keys"
+# document field -> reservation scope
+PRODUCT_KEYS = {"slug": "product_slug", "sku": "product_sku"}
+BLOG_KEYS = {"slug": "blog_slug"}
+# reservation scope -> (collection, field) of the documents holding its values
+SCOPES = {**{scope: ("products", f) for f, scope in PRODUCT_KEYS.items()},
+          **{scope: ("blogs", f) for f, scope in BLOG_KEYS.items()}}
+
+def normalize(value) -> str | None:
+    value = str(value).strip().lower() if value is not None else ""
+    return value or None
+
+def key_ref(scope: str, value: str):
+    # document ids can't contain "/"
+    return adb().collection(COLLECTION).document(f"{scope}:{quote(normalize(value), safe='')}")
+
+def claim(writer, keys: dict, owner_id: str, new: dict, old: dict | None = None):
+    """
+    Queue on `writer` (batch or transaction) the reservation changes for an
+    owner going from `old` to `new`; only fields present in `new` are looked at.
+    """
+    old = old or {}
+    for field, scope in keys.items():
+        if field not in new:
+            continue
+        before, after = normalize(old.get(field)), normalize(new.get(field))
+        if before == after:
+            continue
+        if after:
+            writer.create(key_ref(scope, after), {"scope": scope, "value": after, "owner_id": owner_id,
+                                                  "created_at": now_iso()})
+        if before:
+            writer.delete(key_ref(scope, before))
+
+def release(writer, keys: dict, owner_id: str, data: dict):
+    claim(writer, keys, owner_id, {f: None for f in keys}, data)
+
+async def owner(scope: str, value: str) -> str | None:
+    key = normalize(value)
+    if not key:
+        return None
+    snap = await key_ref(scope, key).get()
+    if snap.exists:
+        return (snap.to_dict() or {}).get("owner_id")
+    # not reserved: a document written before reservations may still hold it
+    collection, field = SCOPES[scope]
+    values = list(dict.fromkeys([str(value).strip(), key]))
+    docs = await adb().collection(collection).where(field, "in", values).limit(1).select([]).get()
+    return docs[0].id if docs else None
+
+async def check(keys: dict, owner_id: str, new: dict):
+    """409 if a value in `new` is held by another document, reserved or not."""
+    for field, scope in keys.items():
+        held_by = await owner(scope, new.get(field))
+        if held_by is not None and held_by != owner_id:
+            raise HTTPException(409, detail=f"{field} must be unique")
+
+async def conflict(keys: dict, owner_id: str, new: dict) -> HTTPException:
+    """The 409 for a commit that failed with AlreadyExists, naming the taken field."""
+    taken = [f for f in keys if normalize(new.get(f))]
+    for field in taken:
+        held_by = await owner(keys[field], new[field])
+        if held_by is not None and held_by != owner_id:
+            return HTTPException(409, detail=f"{field} must be unique")
+    return HTTPException(409, detail=f"{(taken or list(keys))[0]} must be unique")
+
+async def rebuild() -> dict:
+    """
+    Backfill: reserve the slug/SKU of every product and blog (oldest document
+    wins a duplicate) and drop reservations nobody holds. Duplicates that
+    already exist are reported, not changed.
+    """
+    wanted: dict[str, tuple[str, str, str]] = {}
+    conflicts = []
+    for collection, keys in (("products", PRODUCT_KEYS), ("blogs", BLOG_KEYS)):
+        docs = await adb().collection(collection).select([*keys, "created_at"]).get()
+        for d in sorted(docs, key=lambda s: str(s.get("created_at") or "")):
+            for field, scope in keys.items():
+                value = normalize(d.get(field))
+                if not value:
+                    continue
+                ref = key_ref(scope, value)
+                if ref.id in wanted:
+                    conflicts.append({"scope": scope, "value": value, "ids": [wanted[ref.id][2], d.id]})
+                    continue
+                wanted[ref.id] = (scope, value, d.id)
+
+    writer = BulkWriter()
+    for r in await adb().collection(COLLECTION).select([]).get():
+        if r.id not in wanted:
+            writer.delete(r.reference)
+    t = now_iso()
+    for doc_id, (scope, value, owner_id) in wanted.items():
+        writer.set(adb().collection(COLLECTION).document(doc_id),
+                   {"scope": scope, "value": value, "owner_id": owner_id, "created_at": t})
+    await writer.commit()
+    return {"reserved": len(wanted), "conflicts": conflicts}
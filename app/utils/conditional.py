@@ -0,0 +1,69 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+# Conditional GET for read endpoints. The ETag is a hash of the serialized
+# body, so it is strong and also changes for fields that are written without
+# touching updated_at (ratings, counters). Documents that are only changed
+# along with updated_at (blogs, site content) also get it as Last-Modified;
+# products and seller profiles don't (rating writes leave updated_at alone), nor
+# do lists, since removing an item changes a list without making anything in it
+# newer. A matching If-None-Match (or, without one, an If-Modified-Since not
+# older than Last-Modified) gets a 304.
+
+def _parse_iso(value) -> datetime | None:
+    if not value:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole seconds
+    return dt.astimezone(timezone.utc).replace(microsecond=0)
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def _etag_matches(header: str, etag: str) -> bool:
+    # weak comparison, as RFC 9110 specifies for If-None-Match
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in (t.removeprefix("W/") for t in tags)
+
+def _not_modified(request: Request, etag: str, modified: datetime | None) -> bool:
+    inm = request.headers.get("if-none-match")
+    if inm is not None:
+        return _etag_matches(inm, etag)
+    ims = request.headers.get("if-modified-since")
+    if ims and modified is not None:
+        try:
+            since = parsedate_to_datetime(ims)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        return modified <= since
+    return False
+
+def render(payload) -> tuple[bytes, str]:
+    """Serialized JSON body and its ETag, e.g. to cache a response."""
+    body = JSONResponse(jsonable_encoder(payload)).body
+    return body, etag_for(body)
+
+def conditional(request: Request, payload, last_modified: str | None = None) -> Response:
+    """JSON response for `payload` with validators, or an empty 304."""
+    return respond(request, *render(payload), last_modified)
+
+def respond(request: Request, body: bytes, etag: str, last_modified: str | None = None) -> Response:
+    modified = _parse_iso(last_modified)
+    # clients must revalidate: Last-Modified alone would allow heuristic caching
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if modified is not None:
+        headers["Last-Modified"] = format_datetime(modified, usegmt=True)
+    if _not_modified(request, etag, modified):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,151 @@
+import asyncio
+import base64
+import json
+import random
+import re
+from fastapi import HTTPException
+from google.api_core import exceptions as gexc
+from app.core.firebase import adb
+
+ASC = "ASCENDING"
+DESC = "DESCENDING"
+
+_FIELD_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+def parse_fields(fields: str | None, default) -> list[str] | None:
+    """
+    `fields=` query value -> projection: unset means `default`, "all" means the
+    whole document (None), otherwise the comma-separated names plus "id".
+    """
+    if not fields or not fields.strip():
+        return list(default)
+    if fields.strip() == "all":
+        return None
+    names = [f.strip() for f in fields.split(",") if f.strip()]
+    for f in names:
+        if not _FIELD_NAME.match(f):
+            raise HTTPException(400, detail=f"Invalid field name: {f}")
+    return list(dict.fromkeys(["id", *names]))
+
+def project(doc: dict, fields: list[str] | None) -> dict:
+    return doc if fields is None else {f: doc[f] for f in fields if f in doc}
+
+def encode_cursor(values: dict) -> str:
+    raw = json.dumps(values, separators=(",", ":"), default=str).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except Exception:
+        raise HTTPException(400, detail="Invalid cursor")
+    if not isinstance(values, dict):
+        raise HTTPException(400, detail="Invalid cursor")
+    return values
+
+async def paginate(query, order: list[tuple[str, str]], limit: int, cursor: str | None = None,
+                   fields: list[str] | None = None) -> dict:
+    """
+    One keyset page of `query`: order_by(order) + document id as tiebreaker,
+    start_after the decoded cursor, limit+1 to know if there is a next page.
+    `fields` is a select() projection (None = whole documents).
+    Returns {"items": [...], "next_cursor": str | None}.
+    """
+    order_fields = [f for f, _ in order]
+    q = query
+    if fields is not None:
+        q = q.select(list(dict.fromkeys([*fields, *order_fields])))
+    for field, direction in order:
+        q = q.order_by(field, direction=direction)
+    q = q.order_by("__name__", direction=order[-1][1] if order else ASC)
+    if cursor:
+        values = decode_cursor(cursor)
+        if set(values) != set(order_fields) | {"__name__"}:
+            raise HTTPException(400, detail="Cursor does not match this listing")
+        q = q.start_after(values)
+
+    docs = await q.limit(limit + 1).get()
+    page = docs[:limit]
+    next_cursor = None
+    if len(docs) > limit:
+        last = page[-1]
+        next_cursor = encode_cursor({**{f: last.get(f) for f in order_fields}, "__name__": last.id})
+    return {"items": [project(d.to_dict(), fields) for d in page], "next_cursor": next_cursor}
+
+async def count(query, transaction=None) -> int:
+    # server-side count aggregation: billed per 1000 index entries, no documents read
+    res = await query.count(alias="n").get(transaction=transaction)
+    return int(res[0][0].value)
+
+async def total(query, field: str, transaction=None) -> float:
+    res = await query.sum(field, alias="s").get(transaction=transaction)
+    return float(res[0][0].value or 0)
+
+# Firestore rejects batches with more than 500 writes
+BATCH_LIMIT = 500
+_RETRYABLE = (gexc.Aborted, gexc.DeadlineExceeded, gexc.ServiceUnavailable, gexc.ResourceExhausted,
+              gexc.InternalServerError)
+
+class BulkWriter:
+    """
+    Queue set/update/delete like a WriteBatch, then commit() them as batches of
+    at most `chunk` writes, up to `concurrency` batches in flight, each retried
+    on transient errors with jittered exponential backoff. Only each chunk is
+    atomic, and chunks may land in any order: queue one write per document, and
+    keep Increment() out of it unless a rare double-apply on retry is acceptable.
+    """
+
+    def __init__(self, chunk: int = BATCH_LIMIT, concurrency: int = 4, retries: int = 5):
+        self._ops: list[tuple] = []
+        self._chunk = min(chunk, BATCH_LIMIT)
+        self._concurrency = concurrency
+        self._retries = retries
+
+    def __len__(self):
+        return len(self._ops)
+
+    def set(self, ref, data: dict, merge: bool = False):
+        self._ops.append(("set", ref, data, merge))
+
+    def update(self, ref, data: dict):
+        self._ops.append(("update", ref, data, None))
+
+    def delete(self, ref):
+        self._ops.append(("delete", ref, None, None))
+
+    async def _commit_chunk(self, ops: list[tuple]):
+        for attempt in range(self._retries + 1):
+            batch = adb().batch()
+            for kind, ref, data, merge in ops:
+                if kind == "set":
+                    batch.set(ref, data, merge=merge)
+                elif kind == "update":
+                    batch.update(ref, data)
+                else:
+                    batch.delete(ref)
+            try:
+                await batch.commit()
+                return
+            except _RETRYABLE:
+                if attempt == self._retries:
+                    raise
+                await asyncio.sleep(min(0.1 * 2 ** attempt, 5) * (0.5 + random.random()))
+
+    async def commit(self) -> int:
+        """Write everything queued; returns the number of writes."""
+        ops, self._ops = self._ops, []
+        sem = asyncio.Semaphore(self._concurrency)
+
+        async def _one(chunk):
+            async with sem:
+                await self._commit_chunk(chunk)
+
+        await asyncio.gather(*(_one(ops[i:i + self._chunk]) for i in range(0, len(ops), self._chunk)))
+        return len(ops)
+
+async def bulk_delete(refs) -> int:
+    writer = BulkWriter()
+    for ref in refs:
+        writer.delete(ref)
+    return await writer.commit()
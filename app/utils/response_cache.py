@@ -0,0 +1,32 @@
+from fastapi import Request, Response
+from app.core.cache import StaleWhileRevalidateCache
+from app.core.config import settings
+from app.utils.conditional import render, respond
+
+# Per-worker cache of rendered public listing responses (same for every
+# visitor), keyed by route and the endpoint's parsed query parameters. Entries
+# are fresh for RESPONSE_CACHE_TTL, then served stale while one background
+# reload runs; an old response also stands in when Firestore errors or is slow.
+# Writes in this worker invalidate their route; other workers catch up on the
+# next reload.
+
+public_cache = StaleWhileRevalidateCache(
+    maxsize=settings.RESPONSE_CACHE_SIZE,
+    ttl=settings.RESPONSE_CACHE_TTL,
+    stale_ttl=settings.RESPONSE_CACHE_STALE_SECONDS,
+    maxbytes=settings.RESPONSE_CACHE_MAX_MB * 1024 * 1024,
+)
+
+async def cached(request: Request, route: str, params: dict, load) -> Response:
+    """`load()` -> payload, rendered and cached under (route, params); served with an ETag."""
+    key = (route, tuple(sorted(params.items())))
+
+    async def _load():
+        return render(await load())
+
+    body, etag = await public_cache.get(key, _load)
+    return respond(request, body, etag)
+
+def invalidate(*routes: str):
+    for route in routes:
+        public_cache.invalidate(route)